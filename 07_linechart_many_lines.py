@@ -1,95 +1,87 @@
 # This is another variation of a line chart, which can be used to illustrate a quantity of values, with an emphasis on one or
 # several particular items. I'll use it to draw the dynamics of all the key federal spending in Russia in 2011–2021.
 
-# The most interesting items are colored; "the rest" is made in a cycle. 
+# The most interesting items are colored; "the rest" are drawn all at once, in gray.
 
-import pandas as pd
-import numpy as np
-
-import matplotlib.pyplot as plt
 import matplotlib.markers
 
 import seaborn as sns
 
+from budgetviz.figures import new_figure
+from budgetviz.fonts import use_chart_font
+from budgetviz.pivots import budget_pivot
+from budgetviz.plots import highlighted_lines
+from budgetviz.stages import stage
+from budgetviz.themes import style_axes
 
-# THE DATA ********************************************************************************************************************
 
+OUTPUT = '07_linechart_many_lines.png'
 
-df = pd.read_csv('russian_budget_data.csv', index_col=0)
 
-# extracting major expenditures
-spending_change = df.query('i1 == 2 & i2 == 2 & i3 == 2 & 0 < s1 < 13 & s2 == 0')[['index', 'year', 'value']].set_index('year')
+# THE DATA ********************************************************************************************************************
 
-# -> trillions of rubles
-spending_change['spending_tn'] = (spending_change['value']/1000000000000).round(1)
 
-# items -> columns (years are rows)
-spending_change = spending_change[['index', 'spending_tn']].pivot(columns='index', values='spending_tn')
+def prepare_data():
+    # extracting major expenditures: items -> columns (years are rows)
+    spending_change = budget_pivot(i1=2, i2=2, i3=2, s1=range(1, 13), s2=0, index='year')
 
+    # -> trillions of rubles
+    spending_change = (spending_change/1000000000000).round(1)
 
-# THE CHART *******************************************************************************************************************
+    return spending_change
 
 
-font = {'fontname':'Calibri'}
+# THE CHART *******************************************************************************************************************
 
-xticks = spending_change.index # ticklabels: years
-x_range = np.arange(len(spending_change['education']))
 
-# a list of sums and a list of labels for spending items
-y = []
-labels = []
-for i in range(len(spending_change.columns)):
-    y.append(spending_change.iloc[:, i])
-    labels.append(spending_change.iloc[:, i].name.upper())
+def build_chart(spending_change):
+    xticks = spending_change.index # ticklabels: years
 
-sns.set_style('whitegrid')
+    # the sums of the spending items as an array of (item, year), and their labels
+    y = spending_change.to_numpy().T
+    labels = spending_change.columns.str.upper()
 
-fig, ax = plt.subplots(figsize=(10,4))
+    sns.set_style('whitegrid')
+    use_chart_font()
 
-# those items that haven't grown notably will be gray and have no markers
-for i in [0,1,2,3,5,6,7,9,10]:
-    ax.plot(xticks, y[i], color='silver', lw=2.5, zorder=0)
+    fig = new_figure(figsize=(10,4))
+    ax = fig.subplots()
 
-# items that have grown significantly will be colored and will have markers
-colors = dict({4:'#9E0085', 8:'#007D61', 11:'#B68600'})
-for i in [4,8,11]:
-    ax.plot(xticks, y[i], color=colors[i], lw=2.5, zorder=1) # a line
-    ax.plot(xticks[-1], y[i][2021]+0.02, 'o', markersize=6, color=colors[i]) # a marker on the end of the line
-    ax.text(xticks[-1]+0.2, y[i][2021], labels[i], color ='k', fontsize=10, fontweight='bold', **font) # a label
+    # items that have grown significantly will be colored and will have markers and labels on the end of the line; those
+    # that haven't grown notably (all the rest) will be gray and have no markers
+    colors = dict({4:'#9E0085', 8:'#007D61', 11:'#B68600'})
+    highlighted_lines(ax, xticks, y, colors, labels=labels, background='silver', linewidth=2.5, markersize=6,
+                      marker_offset=0.02, label_offset=0.2, color='k', fontsize=10, fontweight='bold')
 
-ax.set_ylim(ymin=0)
-ax.set_xlim(xmin=2010.95, xmax=2021.05)
+    ax.set_ylim(ymin=0)
+    ax.set_xlim(xmin=2010.95, xmax=2021.05)
 
-# grid, ticks, and ticklabels design
+    # grid, ticks, and ticklabels design
 
-ax.xaxis.tick_bottom() # show the ticks
+    ax.xaxis.tick_bottom() # show the ticks
 
-ax.set_xticks(xticks)
-ax.set_xticklabels(xticks)
-ax.set_yticks([1, 2, 3, 4, 5, 6, 7])
-ax.set_yticklabels(['1tn', '2tn', '3tn', '4tn', '5tn', '6tn', '7tn'])
+    ax.set_xticks(xticks)
+    ax.set_xticklabels(xticks)
+    ax.set_yticks([1, 2, 3, 4, 5, 6, 7])
+    ax.set_yticklabels(['1tn', '2tn', '3tn', '4tn', '5tn', '6tn', '7tn'])
 
-ax.grid(axis='x') # show only horizontal gridlines
+    ax.grid(axis='x') # show only horizontal gridlines
 
-sns.despine(left=True, top=True, right=True, bottom=True) # delete all spines
-ax.axhline(0, color='k', lw=2.5, linestyle='-') # bold zero line
+    sns.despine(fig=fig, left=True, top=True, right=True, bottom=True) # delete all spines
+    ax.axhline(0, color='k', lw=2.5, linestyle='-') # bold zero line
 
-ax.tick_params(axis='x', colors='#4f5b66', direction='out', length=5) # set ticks to be beyond the axes 
-ax.tick_params(axis='y', colors='#4f5b66')
+    # ticks as vertical lines across a bottom spine shifted lower (to place the ticklabels), and the ticklabels' colors
+    with stage('ticks'):
+        style_axes(ax, 'nyt_lines')
 
-ax.spines['bottom'].set_position(('outward', 10)) # shift the bottom spine lower (to place the ticklabels)
+    ax.set_title('WHICH FEDERAL SPENDINGS HAVE GROWN SIGNIFICANTLY AFTER 2017, RUB TRILLION', x=0.9, y=1.15, fontsize=15,
+                 color='k', ha='right', va='top')
 
-for i in ax.xaxis.get_ticklines(): # ticks: vertical lines
-    i.set_marker('|')
+    return fig
 
-for label in ax.get_xticklabels():
-    label.set(fontsize=12, color='#4f5b66', **font)
-for label in ax.get_yticklabels():
-    label.set(fontsize=12, color='k', **font)
-    
-ax.set_title('WHICH FEDERAL SPENDINGS HAVE GROWN SIGNIFICANTLY AFTER 2017, RUB TRILLION', x=0.9, y=1.15, fontsize=15,
-             color='k', ha='right', va='top', **font)
 
-plt.savefig('07_linechart_many_lines.png', dpi=300, bbox_inches='tight')
+if __name__ == '__main__':
+    from budgetviz.figures import render
+    from budgetviz.output import save_figure
 
-plt.show() 
\ No newline at end of file
+    render(build_chart, prepare_data(), OUTPUT, save=save_figure, dpi=300)
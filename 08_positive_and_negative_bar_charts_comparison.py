@@ -6,141 +6,160 @@
 import pandas as pd
 import numpy as np
 
-import matplotlib.pyplot as plt
 import matplotlib.ticker as mtick
 from matplotlib.ticker import FixedLocator
+from matplotlib.artist import setp
+
+from budgetviz.codes import gt
+from budgetviz.figures import new_figure
+from budgetviz.fonts import use_chart_font
+from budgetviz.pivots import budget_pivot
+from budgetviz.plots import bar_labels, diverging_colors, set_bar_labels
+from budgetviz.stages import stage
+from budgetviz.themes import style_axes
+
+
+OUTPUT = '08_positive_and_negative_bar_charts_comparison.png'
 
 
 # THE DATA ********************************************************************************************************************
 
 
-df = pd.read_csv('russian_budget_data.csv', index_col=0)
+def prepare_data():
+    # Extracting the data on federal taxes and transfers from the federal center + USDRUB exchange rate
+    cum_flow = budget_pivot(dict(i1=1, r1=gt(1), r3=0), dict(i1=1, i3=9), fill_value=0)
+
+    # Absolute money flow between the region and the state, in $ mln
+    cum_flow['flow_to_fed_usdbn'] = ((cum_flow['tax_to_fed']-cum_flow['transfers_to_reg'])/cum_flow['rub_usd']/1000000000).round(1)
 
-# Extracting the data on federal taxes and transfers from the federal center + USDRUB exchange rate
-cum_flow = df.query('(i1 == 1 & r1 > 1 & r3 == 0) | (i1 == 1 & i3 == 9)')[['index', 'year', 'region_eng', 'value']].pivot(
-    index=['year', 'region_eng'], columns='index', values='value').fillna(0)
+    # Flow totals for each region for 2017–2021 
+    cum_flow_2017_2021 = cum_flow.loc[2017:2021][['flow_to_fed_usdbn']].groupby(level=1).cumsum().loc[2021].sort_values(
+        by='flow_to_fed_usdbn', ascending=True)
+    cum_flow_2017_2021['flow_to_fed_usdbn'] = cum_flow_2017_2021['flow_to_fed_usdbn'].astype('int')
 
-# Absolute money flow between the region and the state, in $ mln
-cum_flow['flow_to_fed_usdbn'] = ((cum_flow['tax_to_fed']-cum_flow['transfers_to_reg'])/cum_flow['rub_usd']/1000000000).round(1)
+    # Filter out the regions which gave away or absorbed less than $1 billion in 2017–2021
+    cum_flow_2017_2021 = cum_flow_2017_2021.query('flow_to_fed_usdbn < -1 | flow_to_fed_usdbn > 1')
 
-# Flow totals for each region for 2017–2021 
-cum_flow_2017_2021 = cum_flow.loc[2017:2021][['flow_to_fed_usdbn']].groupby(level=1).cumsum().loc[2021].sort_values(
-    by='flow_to_fed_usdbn', ascending=True)
-cum_flow_2017_2021['flow_to_fed_usdbn'] = cum_flow_2017_2021['flow_to_fed_usdbn'].astype('int')
+    # Flow totals for each region for for 2012–2016
+    cum_flow_2012_2016 = cum_flow.loc[2012:2016][['flow_to_fed_usdbn']].groupby(level=1).cumsum().loc[2016].sort_values(
+        by='flow_to_fed_usdbn', ascending=True)
+    cum_flow_2012_2016['flow_to_fed_usdbn_prev'] = cum_flow_2012_2016['flow_to_fed_usdbn'].astype('int')
 
-# Filter out the regions which gave away or absorbed less than $1 billion in 2017–2021
-cum_flow_2017_2021 = cum_flow_2017_2021.query('flow_to_fed_usdbn < -1 | flow_to_fed_usdbn > 1')
+    # Joining the tables to filer and sort the values for 2012–2016
+    cum_flow_2017_2021 = cum_flow_2017_2021.join(cum_flow_2012_2016[['flow_to_fed_usdbn_prev']], how='left')
 
-# Flow totals for each region for for 2012–2016
-cum_flow_2012_2016 = cum_flow.loc[2012:2016][['flow_to_fed_usdbn']].groupby(level=1).cumsum().loc[2016].sort_values(
-    by='flow_to_fed_usdbn', ascending=True)
-cum_flow_2012_2016['flow_to_fed_usdbn_prev'] = cum_flow_2012_2016['flow_to_fed_usdbn'].astype('int')
+    # The totals of the same regions for every 5-year window since 2012, summed the same way, for a sweep (see build_sweep):
+    # a column per window, named by its first year
+    last_year = cum_flow.index.get_level_values('year').max()
+    windows = {first: cum_flow.loc[first:first+4]['flow_to_fed_usdbn'].groupby(level=1).cumsum().loc[first+4].astype('int')
+               for first in range(2012, last_year-3)}
+    cum_flow_2017_2021 = cum_flow_2017_2021.join(pd.DataFrame(windows), how='left')
 
-# Joining the tables to filer and sort the values for 2012–2016
-cum_flow_2017_2021 = cum_flow_2017_2021.join(cum_flow_2012_2016[['flow_to_fed_usdbn_prev']], how='left')
+    return cum_flow_2017_2021
 
 
 # THE CHART *******************************************************************************************************************
 
 
-x = cum_flow_2017_2021.index.str.title() # region names
-y1 = cum_flow_2017_2021['flow_to_fed_usdbn'] # 2017-2021 cumulative flows 
-y2 = cum_flow_2017_2021['flow_to_fed_usdbn_prev'] # 2012-2016 cumulative flows 
-
-# Positive and negative flow colors for 2017-2021 
-color_bars_1 = dict()
-for i in range(len(x)):
-    color_bars_1 = []
-    for val in cum_flow_2017_2021['flow_to_fed_usdbn']:
-        if val > 0:
-            color_bars_1.append('#fd9f1a')
-        else:
-            color_bars_1.append('#467481')
-
-# Positive and negative flow colors for 2012-2016 
-color_bars_2 = dict()
-for i in range(len(x)):
-    color_bars_2 = []
-    for val in cum_flow_2017_2021['flow_to_fed_usdbn_prev']:
-        if val > 0:
-            color_bars_2.append('#b46406')
-        else:
-            color_bars_2.append('#003e4f')
-
-font = {'fontname':'Calibri'}
-            
-fig, ax = plt.subplots(figsize=(12,20), facecolor='w', ncols=2, sharey=True)
-
-# The bars
-ax[0].barh(x, y1, color=color_bars_1, align='center', height=0.72)
-ax[1].barh(x, y2, color=color_bars_2, alpha=0.6, align='center', height=0.72)
-
-# The titles
-ax[0].set_title('2017-2021', loc='left', x=0.09, fontsize=13.5, fontweight='bold', pad=10, color='k', **font)
-ax[1].set_title('2012-2016', loc='left', x=0.09, fontsize=13.5, fontweight='bold', pad=10, color='k', **font)
-
-# Annotating the 2017-2021 bars
-for n, m in enumerate(y1):
-    if m > 0:
-        p = -3 # the label position is to the left of the positive bar 
-    else:
-        p = 26 # the label position is to the right of the negative bar 
-        m = -m # hiding the 'minus' before the label
-
-    ax[0].text(x = p, y = n - 0.2, s = f'${m} B', color = 'k', fontsize = 10, horizontalalignment = 'right', **font)
-
-# Annotating the 2012-2016 bars
-for n, m in enumerate(y2):
-    if m > 0:
-        p = -3
-    else:
-        p = 26
-        m = -m
-
-    ax[1].text(x = p, y = n - 0.2, s = f'${m} B', color = 'k', fontsize = 10, horizontalalignment = 'right', **font)
-
-# Setting the minor ticks to draw gridlines between the bars, not over
-ax[0].yaxis.set_major_locator(mtick.FixedLocator(np.arange(len(cum_flow_2017_2021.index))))
-ax[0].yaxis.set_minor_locator(mtick.FixedLocator(np.arange(-0.5, len(cum_flow_2017_2021.index), 1)))
-ax[0].set_yticklabels(x) 
-ax[0].grid(which='minor', axis='y', color='#E6E6E6', linestyle=':', linewidth=1, zorder=3)
-ax[0].grid(visible=None, which='major', axis='y')
-
-ax[1].yaxis.set_major_locator(mtick.FixedLocator(np.arange(len(cum_flow_2017_2021.index))))
-ax[1].yaxis.set_minor_locator(mtick.FixedLocator(np.arange(-0.5, len(cum_flow_2017_2021.index), 1)))
-ax[1].set_yticklabels(x) 
-ax[1].grid(which='minor', axis='y', color='#E6E6E6', linestyle=':', linewidth=1, zorder=3)
-ax[1].grid(visible=None, which='major', axis='y')
-
-# Labelling the common y-axis
-for label in ax[0].get_yticklabels():
-    label.set(fontsize=12, color='k', **font)
-
-# Hiding the x-axis and y-ticks
-ax[0].get_xaxis().set_visible(False)
-ax[1].get_xaxis().set_visible(False)
-ax[0].yaxis.set_tick_params(which='both', length=0)
-ax[1].yaxis.set_tick_params(which='both', length=0)
-
-# Setting the bold zero-line
-ax[0].axvline(0, color='k', linestyle='-', linewidth=0.5, zorder=1)
-ax[1].axvline(0, color='k', linestyle='-', linewidth=0.5, zorder=1)
-
-# Hiding all the spines
-plt.setp(ax[0].spines.values(), visible=False) 
-plt.setp(ax[1].spines.values(), visible=False) 
-
-# Defining the borders
-ax[0].set_xlim(xmin=-50, xmax=220)
-ax[0].set_ylim(ymin=-0.7, ymax=len(cum_flow_2017_2021.index)-0.3)
-ax[1].set_xlim(xmin=-50, xmax=220)
-ax[1].set_ylim(ymin=-0.7, ymax=len(cum_flow_2017_2021.index)-0.3)
-
-plt.tight_layout()
-
-plt.suptitle('CUMULATIVE NET CASH FLOW BETWEEN THE REGIONS AND THE FEDERAL CENTER IN 2017-2021', x=0.78, y=1.02, fontsize=17,
-             ha='right', va='top', **font)
-
-plt.savefig('08_positive_and_negative_bar_charts_comparison.png', dpi=300, bbox_inches='tight')
-
-plt.show()
\ No newline at end of file
+# The chart compares 2017-2021 with 2012-2016; a sweep (budgetviz.sweep) rolls the left window over the years, from
+# 2012-2016 to 2017-2021, against the same 2012-2016 on the right.
+def sweep_frames(cum_flow_2017_2021):
+    return [(first, first+4) for first in cum_flow_2017_2021.columns if not isinstance(first, str)]
+
+
+def build_chart(cum_flow_2017_2021):
+    fig, update = build_sweep(cum_flow_2017_2021)
+    return fig
+
+
+def build_sweep(cum_flow_2017_2021):
+    x = cum_flow_2017_2021.index.str.title() # region names
+    y1 = cum_flow_2017_2021['flow_to_fed_usdbn'] # 2017-2021 cumulative flows 
+    y2 = cum_flow_2017_2021['flow_to_fed_usdbn_prev'] # 2012-2016 cumulative flows 
+
+    # Positive and negative flow colors for 2017-2021 and 2012-2016
+    color_bars_1 = diverging_colors(y1, '#fd9f1a', '#467481')
+    color_bars_2 = diverging_colors(y2, '#b46406', '#003e4f')
+
+    use_chart_font()
+
+    fig = new_figure(figsize=(12,20), facecolor='w')
+    ax = fig.subplots(ncols=2, sharey=True)
+
+    # The bars
+    bars = ax[0].barh(x, y1, color=color_bars_1, align='center', height=0.72)
+    ax[1].barh(x, y2, color=color_bars_2, alpha=0.6, align='center', height=0.72)
+
+    # The titles
+    window_title = ax[0].set_title('2017-2021', loc='left', x=0.09, fontsize=13.5, fontweight='bold', pad=10, color='k')
+    ax[1].set_title('2012-2016', loc='left', x=0.09, fontsize=13.5, fontweight='bold', pad=10, color='k')
+
+    # Annotating the bars: the label is to the left of a positive bar and to the right of a negative one, with no 'minus'
+    labels = []
+    for axes, values in ((ax[0], y1), (ax[1], y2)):
+        labels.append(bar_labels(axes, np.arange(len(values)), values, fmt='$%d B', positive_x=-3, negative_x=26,
+                                 offset=-0.2, color='k', fontsize=10, horizontalalignment='right'))
+
+    # Setting the minor ticks to draw gridlines between the bars, not over
+    ax[0].yaxis.set_major_locator(mtick.FixedLocator(np.arange(len(cum_flow_2017_2021.index))))
+    ax[0].yaxis.set_minor_locator(mtick.FixedLocator(np.arange(-0.5, len(cum_flow_2017_2021.index), 1)))
+    ax[0].set_yticklabels(x) 
+    ax[0].grid(which='minor', axis='y', color='#E6E6E6', linestyle=':', linewidth=1, zorder=3)
+    ax[0].grid(visible=None, which='major', axis='y')
+
+    ax[1].yaxis.set_major_locator(mtick.FixedLocator(np.arange(len(cum_flow_2017_2021.index))))
+    ax[1].yaxis.set_minor_locator(mtick.FixedLocator(np.arange(-0.5, len(cum_flow_2017_2021.index), 1)))
+    ax[1].set_yticklabels(x) 
+    ax[1].grid(which='minor', axis='y', color='#E6E6E6', linestyle=':', linewidth=1, zorder=3)
+    ax[1].grid(visible=None, which='major', axis='y')
+
+    # Labelling the common y-axis
+    with stage('ticks'):
+        style_axes(ax, 'nyt')
+
+    # Hiding the x-axis and y-ticks
+    ax[0].get_xaxis().set_visible(False)
+    ax[1].get_xaxis().set_visible(False)
+    ax[0].yaxis.set_tick_params(which='both', length=0)
+    ax[1].yaxis.set_tick_params(which='both', length=0)
+
+    # Setting the bold zero-line
+    ax[0].axvline(0, color='k', linestyle='-', linewidth=0.5, zorder=1)
+    ax[1].axvline(0, color='k', linestyle='-', linewidth=0.5, zorder=1)
+
+    # Hiding all the spines
+    setp(ax[0].spines.values(), visible=False)
+    setp(ax[1].spines.values(), visible=False)
+
+    # Defining the borders
+    ax[0].set_xlim(xmin=-50, xmax=220)
+    ax[0].set_ylim(ymin=-0.7, ymax=len(cum_flow_2017_2021.index)-0.3)
+    ax[1].set_xlim(xmin=-50, xmax=220)
+    ax[1].set_ylim(ymin=-0.7, ymax=len(cum_flow_2017_2021.index)-0.3)
+
+    with stage('tight_layout'):
+        fig.tight_layout()
+
+    title = fig.suptitle('CUMULATIVE NET CASH FLOW BETWEEN THE REGIONS AND THE FEDERAL CENTER IN 2017-2021', x=0.78, y=1.02,
+                         fontsize=17, ha='right', va='top')
+
+    # Another window goes into the same artists on the left: the same regions in the same order, with the window's totals
+    # as the bars' widths, colors and labels
+    def update(window):
+        values = cum_flow_2017_2021[window[0]].fillna(0).astype('int')
+        for bar, value, color in zip(bars, values, diverging_colors(values, '#fd9f1a', '#467481')):
+            bar.set_width(value)
+            bar.set_facecolor(color)
+        set_bar_labels(labels[0], np.arange(len(values)), values, fmt='$%d B', positive_x=-3, negative_x=26, offset=-0.2)
+        window_title.set_text('%d-%d' % window)
+        title.set_text('CUMULATIVE NET CASH FLOW BETWEEN THE REGIONS AND THE FEDERAL CENTER IN %d-%d' % window)
+        return list(bars) + [labels[0], window_title, title]
+
+    return fig, update
+
+
+if __name__ == '__main__':
+    from budgetviz.figures import render
+    from budgetviz.output import save_figure
+
+    render(build_chart, prepare_data(), OUTPUT, save=save_figure, dpi=300)
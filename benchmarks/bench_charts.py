@@ -0,0 +1,213 @@
+# The time of every chart, stage by stage: the data (prepare_data, everything under the chart's "THE DATA"), the figure
+# (build_chart) and the image (savefig, PNG in memory, with a tight bbox as the charts are saved). Each chart is run
+# several times on a dataset of the size of the real one (1x) and on ones 10x and 100x larger in regions and years; the best
+# and the median time of each stage are printed and appended to a history file (one JSON record per chart, scale and
+# stage), so a chart that became slower, and the stage where it did, show up against the previous run.
+#
+# The datasets are synthetic (budgetviz.synthetic): 85 regions over 2011-2021 at 1x, and more regions and earlier years at
+# 10x and 100x. They are written next to this file (benchmarks/.data) once and reused. With --data, a real CSV is scaled
+# instead: a copy of a region gets a new name ('<region> #2'...), the federal rows aren't copied (there is one center
+# however many regions), and the extra years come before 2011, as copies of the 2011-2021 block shifted back, so the years
+# the charts pick still hold the original data.
+# The prep stage is timed with the dataset's binary cache in place (see budgetviz.data) but with the pivot cache kept in
+# memory only and emptied before each run (see budgetviz.pivots), so it measures the selections and pivots, not a cache
+# lookup; the pivots cached on disk aren't touched.
+#
+# Run from the root of the repo:  python benchmarks/bench_charts.py [chart names...] [--scales 1 10 100] [--repeat 3]
+#                                  [--data CSV]
+# e.g. python benchmarks/bench_charts.py 02 05 --scales 1 10
+
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import warnings
+
+import pandas as pd
+
+import matplotlib
+matplotlib.use('Agg')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from budgetviz import pivots
+from budgetviz.data import DATA_PATH
+from budgetviz.figures import close_figure, headless
+from budgetviz.render import DPI, ROOT, load_chart, select_charts
+from budgetviz.synthetic import write_dataset
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(HERE, '.data')
+HISTORY = os.path.join(HERE, 'history.jsonl')
+
+# scale -> (times the regions, times the years)
+SCALES = {1: (1, 1), 10: (5, 2), 100: (10, 10)}
+
+STAGES = ['prep', 'build', 'save']
+
+REGRESSION = 1.2 # a stage 20% slower than in the previous run is flagged
+
+
+# THE DATASETS ****************************************************************************************************************
+
+
+# A synthetic dataset at a scale, written once.
+def synthetic_dataset(scale):
+    regions, years = SCALES[scale]
+    path = os.path.join(DATA_DIR, 'synthetic-x%d' % scale, DATA_PATH)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_dataset(path + '.tmp', n_regions=85 * regions, years=range(2022 - 11 * years, 2022))
+        os.replace(path + '.tmp', path)
+    return path
+
+
+# A real dataset at a scale: the CSV itself for 1x, a copy made larger for the others (written once, in pieces, so the
+# copy never has to fit into memory).
+def scaled_dataset(source, scale):
+    if scale == 1:
+        return os.path.abspath(source)
+    regions, years = SCALES[scale]
+    folder = os.path.join(DATA_DIR, 'x%d' % scale)
+    path = os.path.join(folder, DATA_PATH)
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(source):
+        return path
+    os.makedirs(folder, exist_ok=True)
+    df = pd.read_csv(source, index_col=0)
+    regional = df['i1'] == 1
+    span = df['year'].max() - df['year'].min() + 1
+    tmp = path + '.tmp'
+    start = 0
+    with open(tmp, 'w', newline='') as f:
+        for block in range(years):
+            for copy in range(regions):
+                part = (df if copy == 0 else df[regional]).copy()
+                if copy:
+                    part['region_eng'] = part['region_eng'] + ' #%d' % (copy + 1)
+                part['year'] -= block * span
+                part.index = pd.RangeIndex(start, start + len(part))
+                start += len(part)
+                part.to_csv(f, header=start == len(part))
+    os.replace(tmp, path)
+    return path
+
+
+# THE STAGES ******************************************************************************************************************
+
+
+def run_once(module):
+    times = dict()
+    pivots._default_cache.clear()
+    start = time.perf_counter()
+    data = module.prepare_data()
+    times['prep'] = time.perf_counter() - start
+    with headless():
+        start = time.perf_counter()
+        fig = module.build_chart(data)
+        times['build'] = time.perf_counter() - start
+        try:
+            start = time.perf_counter()
+            fig.savefig(io.BytesIO(), format='png', dpi=DPI, bbox_inches='tight')
+            times['save'] = time.perf_counter() - start
+        finally:
+            close_figure(fig)
+    return times
+
+
+# The times of each stage of a chart over `repeat` runs, in the folder of the dataset (the scripts read it from the current
+# one); the first run, which builds the dataset's binary cache, isn't counted.
+def time_chart(name, path, repeat):
+    cwd, directory = os.getcwd(), pivots._default_cache.directory
+    os.chdir(os.path.dirname(path))
+    pivots._default_cache.directory = None
+    try:
+        module = load_chart(name)
+        run_once(module)
+        runs = [run_once(module) for _ in range(repeat)]
+    finally:
+        pivots._default_cache.clear()
+        pivots._default_cache.directory = directory
+        os.chdir(cwd)
+    return {stage: [run[stage] for run in runs] for stage in STAGES}
+
+
+# THE HISTORY *****************************************************************************************************************
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# The last recorded best time of every (chart, scale, stage).
+def read_history(filename=HISTORY):
+    last = dict()
+    if os.path.exists(filename):
+        with open(filename) as f:
+            for line in f:
+                record = json.loads(line)
+                last[(record['chart'], record['scale'], record['stage'])] = record['best']
+    return last
+
+
+def append_history(records, filename=HISTORY):
+    with open(filename, 'a') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the charts stage by stage at several dataset scales.')
+    parser.add_argument('charts', nargs='*', help='the charts to time (a name or its beginning, e.g. 02); all by default')
+    parser.add_argument('--scales', type=int, nargs='+', default=sorted(SCALES), choices=sorted(SCALES))
+    parser.add_argument('--repeat', type=int, default=3, help='the runs of each chart to time')
+    parser.add_argument('--data', default=None, help='a real dataset to scale instead of the synthetic ones')
+    parser.add_argument('--history', default=HISTORY, help='the file the results are appended to (JSON lines)')
+    args = parser.parse_args(argv)
+
+    # the missing fonts and the charts' own warnings would bury the table
+    logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+    warnings.simplefilter('ignore', UserWarning)
+
+    previous = read_history(args.history)
+    run = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': git_commit(), 'python': platform.python_version(),
+           'matplotlib': matplotlib.__version__, 'pandas': pd.__version__}
+    records = []
+    regressions = 0
+    print('%-50s %5s %-6s %9s %9s %8s' % ('chart', 'scale', 'stage', 'best, s', 'median, s', 'vs last'))
+    for scale in args.scales:
+        path = synthetic_dataset(scale) if args.data is None else scaled_dataset(args.data, scale)
+        for name in select_charts(args.charts):
+            try:
+                times = time_chart(name, path, args.repeat)
+            except Exception as e:
+                print('%-50s %5s error: %s: %s' % (name, '%dx' % scale, type(e).__name__, e))
+                continue
+            for stage in STAGES:
+                best, median = min(times[stage]), statistics.median(times[stage])
+                last = previous.get((name, scale, stage))
+                ratio = best / last if last else None
+                flag = ' !' if ratio is not None and ratio > REGRESSION else ''
+                regressions += bool(flag)
+                print('%-50s %5s %-6s %9.3f %9.3f %8s%s' % (name, '%dx' % scale, stage, best, median,
+                                                             '-' if ratio is None else '%.2fx' % ratio, flag))
+                records.append(dict(run, chart=name, scale=scale, stage=stage, best=best, median=median,
+                                    times=times[stage]))
+    append_history(records, args.history)
+    if regressions:
+        print('%d stage(s) more than %d%% slower than in the previous run' % (regressions, (REGRESSION - 1) * 100))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+# Row-wise (DataFrame.apply) vs vectorized classification of the regions: the region_inc/inc_order rules of chart 04 and the
+# region_class rule of chart 05, on random (year, region) frames of the regional size (85 regions x 11 years) and 100 times
+# bigger, like the municipal data. Both versions must give exactly the same labels.
+#
+# Run from the root of the repo:  python benchmarks/bench_classify.py
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from budgetviz.classify import class_order, flow_classes, income_groups
+
+
+# THE ROW-WISE RULES (as they were in the charts) *****************************************************************************
+
+
+def region_inc(s):
+    if s['income_per_cap'] == 0:
+        return 'nodata'
+    elif s['income_per_cap'] >= s['inc_quantile_80']:
+        return 'high'
+    elif s['inc_quantile_60'] <= s['income_per_cap'] < s['inc_quantile_80']:
+        return 'higher_avg'
+    elif s['inc_quantile_60'] > s['income_per_cap'] >= s['inc_quantile_40']:
+        return 'lower_avg'
+    elif s['income_per_cap'] < s['inc_quantile_40']:
+        return 'low'
+
+
+def inc_order(s):
+    if s['region_inc'] == 'high':
+        return 0
+    elif s['region_inc'] == 'higher_avg':
+        return 1
+    elif s['region_inc'] == 'lower_avg':
+        return 2
+    elif s['region_inc'] == 'low':
+        return 3
+    elif s['region_inc'] == 'nodata':
+        return 4
+    else:
+        return 5
+
+
+def region_class(s):
+    if s['flow_to_fed'] == 0:
+        return 'no_data'
+    elif s['flow_to_fed'] <= -s['reg_own_revenue']:
+        return 'donor_100_and_more'
+    elif -s['reg_own_revenue'] < s['flow_to_fed'] < 0:
+        return 'donor_up_to_100'
+    elif 0 < s['flow_to_fed'] < s['reg_own_revenue']:
+        return 'dependent_up_to_100'
+    elif s['flow_to_fed'] > s['reg_own_revenue']:
+        return 'dependent_100_and_more'
+
+
+# THE DATA ********************************************************************************************************************
+
+
+def make_frame(n_regions, n_years=11, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.MultiIndex.from_product([range(2011, 2011 + n_years), ['region %d' % i for i in range(n_regions)]],
+                                       names=['year', 'region_eng'])
+    df = pd.DataFrame(index=index)
+    df['income_per_cap'] = rng.lognormal(10, 0.4, len(df)).round(-2)
+    df['reg_own_revenue'] = rng.lognormal(24, 1, len(df)).round(-6)
+    df['flow_to_fed'] = (df['reg_own_revenue'] * rng.normal(0, 1.5, len(df))).round(-6)
+    quantiles = df.groupby(level=0)['income_per_cap'].quantile([0.4, 0.6, 0.8]).unstack()
+    for p in (40, 60, 80):
+        df['inc_quantile_%d' % p] = quantiles[p / 100].reindex(df.index.get_level_values(0)).values
+
+    # the edge cases: no data, a value right on a threshold, missing values, a flow equal to the revenue
+    df.iloc[::97, df.columns.get_loc('income_per_cap')] = 0
+    df.iloc[1::89, df.columns.get_loc('income_per_cap')] = df['inc_quantile_60'].iloc[1::89]
+    df.iloc[2::83, df.columns.get_loc('income_per_cap')] = np.nan
+    df.iloc[3::79, df.columns.get_loc('flow_to_fed')] = 0
+    df.iloc[4::73, df.columns.get_loc('flow_to_fed')] = df['reg_own_revenue'].iloc[4::73]
+    df.iloc[5::71, df.columns.get_loc('flow_to_fed')] = -df['reg_own_revenue'].iloc[5::71]
+    df.iloc[6::67, df.columns.get_loc('flow_to_fed')] = np.nan
+    return df
+
+
+# THE BENCHMARK ***************************************************************************************************************
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def as_labels(classes):
+    # a categorical -> the object labels with None for "no class", like the row-wise rules return
+    return classes.astype(object).where(classes.notna(), None)
+
+
+def row_wise(df):
+    inc = df.apply(region_inc, axis=1)
+    order = pd.DataFrame({'region_inc': inc}).apply(inc_order, axis=1)
+    return inc, order, df.apply(region_class, axis=1)
+
+
+def vectorized(df):
+    inc = income_groups(df['income_per_cap'], df['inc_quantile_40'], df['inc_quantile_60'], df['inc_quantile_80'])
+    return inc, class_order(inc), flow_classes(df['flow_to_fed'], df['reg_own_revenue'])
+
+
+if __name__ == '__main__':
+    print('%8s %12s %12s %9s' % ('rows', 'apply, s', 'vector, s', 'speedup'))
+    for n_regions in (85, 850, 8500):
+        df = make_frame(n_regions)
+        t_rows, (inc_1, order_1, class_1) = best_of(lambda: row_wise(df), 1 if n_regions > 85 else 3)
+        t_vec, (inc_2, order_2, class_2) = best_of(lambda: vectorized(df), 5)
+
+        assert inc_1.equals(as_labels(inc_2)), 'region_inc differs'
+        assert order_1.equals(order_2), 'inc_order differs'
+        assert class_1.equals(as_labels(class_2)), 'region_class differs'
+
+        print('%8d %12.4f %12.4f %8.0fx' % (len(df), t_rows, t_vec, t_rows / t_vec))
@@ -0,0 +1,80 @@
+# The two bar charts of chart 08 with 30 bars (about as many as the chart keeps) and with 85 (all the regions): the colors
+# and the value labels the way the chart used to make them (a color list rebuilt once per bar, one ax.text per bar) vs
+# budgetviz.plots.diverging_colors and bar_labels (one np.where, one TextLayer). The time covers building the figure and
+# saving it (PNG, in memory, at a low DPI, with a tight bbox as the chart is saved).
+#
+# Run from the root of the repo:  python benchmarks/bench_diverging_bars.py
+
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from budgetviz.figures import headless
+from budgetviz.plots import bar_labels, diverging_colors
+
+
+DPI = 30
+
+
+def make_values(n_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(-40, 200, (2, n_bars))
+
+
+def save(fig):
+    fig.savefig(io.BytesIO(), format='png', dpi=DPI, bbox_inches='tight')
+
+
+# THE WAYS TO DRAW THE BARS ***************************************************************************************************
+
+
+def per_bar(values):
+    fig = Figure(figsize=(12, 20))
+    ax = fig.subplots(ncols=2, sharey=True)
+    for axes, y, colors in zip(ax, values, (('#fd9f1a', '#467481'), ('#b46406', '#003e4f'))):
+        for i in range(len(y)):
+            color_bars = []
+            for val in y:
+                color_bars.append(colors[0] if val > 0 else colors[1])
+        axes.barh(np.arange(len(y)), y, color=color_bars, height=0.72)
+        for n, m in enumerate(y):
+            p = -3 if m > 0 else 26
+            axes.text(x=p, y=n - 0.2, s=f'${abs(m)} B', color='k', fontsize=10, horizontalalignment='right')
+    save(fig)
+
+
+def batched(values):
+    fig = Figure(figsize=(12, 20))
+    ax = fig.subplots(ncols=2, sharey=True)
+    for axes, y, colors in zip(ax, values, (('#fd9f1a', '#467481'), ('#b46406', '#003e4f'))):
+        axes.barh(np.arange(len(y)), y, color=diverging_colors(y, *colors), height=0.72)
+        bar_labels(axes, np.arange(len(y)), y, fmt='$%d B', positive_x=-3, negative_x=26, offset=-0.2,
+                   color='k', fontsize=10, horizontalalignment='right')
+    save(fig)
+
+
+def best_of(func, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+if __name__ == '__main__':
+    print('%5s %-10s %9s' % ('bars', 'labels', 'time, s'))
+    with headless():
+        for n_bars in (30, 85):
+            values = make_values(n_bars)
+            for name, func in (('per bar', per_bar), ('batched', batched)):
+                print('%5d %-10s %9.3f' % (n_bars, name, best_of(lambda: func(values))))
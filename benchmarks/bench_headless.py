@@ -0,0 +1,47 @@
+# Memory of a long-lived process that renders the charts again and again in the headless mode (budgetviz.figures.render):
+# the resident memory and the number of live figures are printed as the renders go; both must stay flat. The images are
+# written to memory at a low DPI, so a round is fast.
+#
+# Run from the root of the repo:  python benchmarks/bench_headless.py [rounds] [chart names...]
+
+import gc
+import io
+import os
+import sys
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from budgetviz.figures import render
+from budgetviz.render import load_chart, select_charts
+
+
+def rss():
+    # the current (not the peak) resident memory in MB; Linux only
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024**2
+    except OSError:
+        return float('nan')
+
+
+def live_figures():
+    return sum(isinstance(obj, Figure) for obj in gc.get_objects())
+
+
+if __name__ == '__main__':
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    charts = [load_chart(name) for name in select_charts(sys.argv[2:] or ['01', '04', '06', '07'])]
+    data = [chart.prepare_data() for chart in charts]
+
+    print('%8s %8s %10s %9s' % ('renders', 'RSS, MB', 'figures', 'time, s'))
+    start = time.perf_counter()
+    for i in range(1, rounds + 1):
+        for chart, chart_data in zip(charts, data):
+            render(chart.build_chart, chart_data, io.BytesIO(), format='png', dpi=50)
+        if i == 1 or i % 10 == 0 or i == rounds:
+            print('%8d %8.0f %10d %9.1f' % (i * len(charts), rss(), live_figures(), time.perf_counter() - start))
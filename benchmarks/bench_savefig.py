@@ -0,0 +1,86 @@
+# The time and the file size of a chart's image, saved in different ways: savefig(dpi=300, bbox_inches='tight') as the
+# charts do, and budgetviz.output.save_figure with the tight bbox computed or cached, at the PNG compression levels 1, 6
+# and 9, as WebP and as JPEG. The last two rows write three DPIs (300, 150 and 72): savefig three times, against one draw
+# and two resampled copies. Every way gets a figure just built, so only the save is timed (the best of --repeat runs). The
+# images are written to a temporary folder.
+#
+# Run from the root of the repo:  python benchmarks/bench_savefig.py [chart names...] [--dpi 300] [--repeat 3]
+# e.g. python benchmarks/bench_savefig.py 02 08
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from budgetviz.figures import close_figure, headless
+from budgetviz.output import BBoxCache, dpi_path, save_figure
+from budgetviz.render import load_chart, select_charts
+
+
+DPIS = (150, 72)
+
+
+def ways(dpi, cache):
+    def savefig(fig, filename):
+        fig.savefig(filename, dpi=dpi, bbox_inches='tight')
+        return [filename]
+
+    def savefig_dpis(fig, filename):
+        fig.savefig(filename, dpi=dpi, bbox_inches='tight')
+        for other in DPIS:
+            fig.savefig(dpi_path(filename, other), dpi=other, bbox_inches='tight')
+        return [filename] + [dpi_path(filename, other) for other in DPIS]
+
+    return [('savefig, tight', 'png', savefig),
+            ('one draw, bbox computed', 'png', lambda fig, filename: save_figure(fig, filename, dpi)),
+            ('one draw, bbox cached', 'png',
+             lambda fig, filename: save_figure(fig, filename, dpi, layout='bench', cache=cache)),
+            ('  compress_level=1', 'png',
+             lambda fig, filename: save_figure(fig, filename, dpi, layout='bench', cache=cache, compress_level=1)),
+            ('  compress_level=9', 'png',
+             lambda fig, filename: save_figure(fig, filename, dpi, layout='bench', cache=cache, compress_level=9)),
+            ('  WebP, quality 90', 'webp', lambda fig, filename: save_figure(fig, filename, dpi, layout='bench', cache=cache)),
+            ('  JPEG, quality 90', 'jpg', lambda fig, filename: save_figure(fig, filename, dpi, layout='bench', cache=cache)),
+            ('savefig x3 DPIs', 'png', savefig_dpis),
+            ('one draw, 3 DPIs', 'png',
+             lambda fig, filename: save_figure(fig, filename, dpi, layout='bench', cache=cache, dpis=DPIS))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the ways to save a chart.')
+    parser.add_argument('charts', nargs='*', default=['02', '08'], help='the charts (a name or its beginning)')
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    folder = tempfile.mkdtemp()
+    print('%-50s %-26s %9s %10s' % ('chart', 'save', 'time, s', 'size, kB'))
+    for name in select_charts(args.charts):
+        module = load_chart(name)
+        data = module.prepare_data()
+        cache = BBoxCache(directory=None) # a fresh cache per chart; the first cached save fills it
+        for way, format, save in ways(args.dpi, cache):
+            best = None
+            for _ in range(args.repeat):
+                with headless():
+                    fig = module.build_chart(data)
+                    try:
+                        start = time.perf_counter()
+                        filenames = save(fig, os.path.join(folder, 'chart.' + format))
+                        seconds = time.perf_counter() - start
+                    finally:
+                        close_figure(fig)
+                best = seconds if best is None else min(best, seconds)
+            size = sum(os.path.getsize(filename) for filename in filenames)
+            print('%-50s %-26s %9.2f %10.0f' % (name, way, best, size / 1024))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
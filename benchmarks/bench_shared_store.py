@@ -0,0 +1,64 @@
+# The memory of several processes reading the dataset at the same time, as the chart workers of budgetviz.render do: each
+# one loads the store and reads every column through, once from the Feather cache, once from the .npz one (both mapped,
+# see budgetviz.data) and once parsed from the CSV with no cache. Printed per process: the resident memory (RSS, which
+# counts the shared pages in every process) and the proportional one (PSS, which splits them among the processes that
+# share them); with a mapped cache, PSS drops as the processes are added. Linux only (/proc/self/smaps_rollup). The dataset
+# is the 100x synthetic one of bench_charts.py, written once; another CSV can be given instead.
+#
+# Run from the root of the repo:  python benchmarks/bench_shared_store.py [CSV] [--processes 4]
+
+import argparse
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_charts import synthetic_dataset
+from budgetviz import data
+
+
+def memory():
+    # (RSS, PSS) in MB
+    sizes = dict()
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                sizes[key] = int(rest.split()[0]) / 1024
+    return sizes['Rss'], sizes['Pss']
+
+
+def read_all(path, cache_format, cache, ready, done):
+    data.CACHE_FORMAT = cache_format
+    store = data._load_store(path, cache)
+    total = sum(float(np.sum(store['arrays'][col], dtype='float64')) for col in store['columns'])
+    total += float(np.sum(store['order'])) + sum(float(np.sum(keys)) for keys in store['keys'].values())
+    ready.wait() # every process has read everything before any of them measures
+    result = memory()
+    done.wait()
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='The memory of processes that share the dataset.')
+    parser.add_argument('data', nargs='?', default=None, help='a CSV to read instead of the 100x synthetic one')
+    parser.add_argument('--processes', type=int, default=4)
+    args = parser.parse_args()
+    path = os.path.abspath(args.data) if args.data else synthetic_dataset(100)
+
+    print('%-10s %9s %14s %14s' % ('store', 'processes', 'RSS/proc, MB', 'PSS/proc, MB'))
+    ctx = multiprocessing.get_context('spawn')
+    for name, cache_format, cache in (('feather', 'feather', True), ('npz', 'npz', True), ('CSV', 'npz', False)):
+        if cache:
+            data.CACHE_FORMAT = cache_format
+            data.load_code_index(path) # the cache is written here, not by the processes measured
+        for n in sorted({1, args.processes}):
+            with ctx.Manager() as manager:
+                ready, done = manager.Barrier(n), manager.Barrier(n)
+                with ctx.Pool(n) as pool:
+                    results = pool.starmap(read_all, [(path, cache_format, cache, ready, done)] * n)
+            rss, pss = np.mean(results, axis=0)
+            print('%-10s %9d %14.0f %14.0f' % (name, n, rss, pss))
@@ -0,0 +1,99 @@
+# The grid of chart 02 with 20 and 85 panels (all the regions): the way the chart used to make it (a throwaway subplot, then
+# one axes per panel with its own limits and formatter) vs budgetviz.multiples.SmallMultiples (the axes made once, sharing
+# their x and y axes), in one figure and in batches of 20 panels. The panels are random stacked areas with their edge lines,
+# like the chart's. The time covers building the figure and saving it (PNG, in memory, at a low DPI).
+#
+# Run from the root of the repo:  python benchmarks/bench_small_multiples.py
+
+import io
+import math
+import os
+import sys
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from budgetviz.figures import headless
+from budgetviz.multiples import SmallMultiples, small_multiples
+from budgetviz.plots import stacked_area
+
+from grid_panels import COLORS, DPI, YEARS, make_panels
+
+
+def style_panel(ax, i):
+    ax.set_title('region %d' % i, fontweight='bold', fontsize=17, pad=20)
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.yaxis.get_major_ticks()[0].label1.set_visible(False)
+
+
+def draw_panel(ax, area, i):
+    stacked_area(ax, YEARS, area, COLORS)
+    style_panel(ax, i)
+
+
+def save(fig):
+    fig.savefig(io.BytesIO(), format='png', dpi=DPI)
+
+
+# THE WAYS TO DRAW THE GRID ***************************************************************************************************
+
+
+def per_axes(panels, ncols=5):
+    nrows = math.ceil(len(panels) / ncols)
+    fig = Figure(figsize=(ncols * 4, nrows * 4))
+    throwaway = fig.subplots(squeeze=False)[0, 0]
+    spec = fig.add_gridspec(nrows, ncols)
+    for i, area in enumerate(panels):
+        ax = fig.add_subplot(spec[i // ncols, i % ncols])
+        if i == 0:
+            throwaway.remove()
+        draw_panel(ax, area, i)
+        ax.yaxis.set_major_formatter('{x:1.0f}B')
+        ax.set_ylim(0, 600)
+        ax.set_xlim(2010.99, 2021.01)
+    fig.tight_layout()
+    save(fig)
+
+
+def one_grid(panels, ncols=5):
+    grid = small_multiples(len(panels), ncols)
+    for ax in grid.shared_axes():
+        ax.yaxis.set_major_formatter('{x:1.0f}B')
+    grid.set_limits(xlim=(2010.99, 2021.01), ylim=(0, 600))
+    fig = grid.draw(lambda ax, i: draw_panel(ax, panels[i], i), range(len(panels)))
+    fig.tight_layout()
+    save(fig)
+
+
+def in_batches(panels, nrows=4, ncols=5):
+    grid = SmallMultiples(nrows, ncols)
+    for ax in grid.shared_axes():
+        ax.yaxis.set_major_formatter('{x:1.0f}B')
+    grid.set_limits(xlim=(2010.99, 2021.01), ylim=(0, 600))
+    for fig in grid.batches(lambda ax, i: draw_panel(ax, panels[i], i), range(len(panels))):
+        fig.tight_layout()
+        save(fig)
+
+
+def best_of(func, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+if __name__ == '__main__':
+    print('%7s %-12s %9s %15s' % ('panels', 'grid', 'time, s', 'per panel, ms'))
+    with headless():
+        for n_panels in (20, 85):
+            panels = make_panels(n_panels)
+            for name, func in (('per axes', per_axes), ('one grid', one_grid), ('batches', in_batches)):
+                t = best_of(lambda: func(panels))
+                print('%7d %-12s %9.2f %15.1f' % (n_panels, name, t, t / n_panels * 1000))
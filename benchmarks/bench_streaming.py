@@ -0,0 +1,70 @@
+# The peak memory and the time of a selection read straight from the CSV: the whole file parsed and then filtered (as the
+# charts used to do), the store built from it (budgetviz.data, without its cache on disk) and the rows taken from that, and
+# the CSV read in chunks with the filters applied as it's read (budgetviz.data.scan_rows). Each way runs in a fresh process,
+# so its peak resident memory is its own. The dataset is the 100x synthetic one of bench_charts.py (about 2M rows), written
+# once; another CSV can be given instead.
+#
+# Run from the root of the repo:  python benchmarks/bench_streaming.py [CSV]
+
+import multiprocessing
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_charts import synthetic_dataset
+from budgetviz import data
+from budgetviz.codes import Compare, ne
+from budgetviz.render import format_size, peak_rss
+
+
+# (name, clauses, years) as the charts select them
+SELECTIONS = [
+    ('flows, all years', (dict(i1=1, r1=ne(0), r3=0),), None),
+    ('key taxes, 2 years', (dict(i1=1, r1=3, r3=3, r4=1), dict(i1=1, r1=3, r3=7, r4=5, r5=0)), (2011, 2021)),
+    ('population', (dict(i3=5),), None),
+]
+
+COLUMNS = ['year', 'index', 'region_eng', 'value']
+
+
+def whole_csv(path, clauses, years):
+    df = pd.read_csv(path, index_col=0)
+    query = ' | '.join('(%s)' % ' & '.join('%s %s %d' % (code, '!=', cond.code) if isinstance(cond, Compare) else
+                                           '%s == %d' % (code, cond) for code, cond in clause.items())
+                       for clause in clauses)
+    df = df.query(query)
+    if years is not None:
+        df = df[df['year'].isin(years)]
+    return df[COLUMNS]
+
+
+def store(path, clauses, years):
+    rows = data.load_code_index(path, cache=False).rows(*clauses)
+    df = data.take_rows(rows, COLUMNS, path, cache=False)
+    return df if years is None else df[df['year'].isin(years)]
+
+
+def scan(path, clauses, years):
+    return data.scan_rows(*clauses, columns=COLUMNS, years=years, path=path)
+
+
+def measure(func, path, clauses, years):
+    start = time.perf_counter()
+    rows = len(func(path, clauses, years))
+    return time.perf_counter() - start, peak_rss(), rows
+
+
+if __name__ == '__main__':
+    path = os.path.abspath(sys.argv[1]) if len(sys.argv) > 1 else synthetic_dataset(100)
+    print('%s, %s' % (path, format_size(os.path.getsize(path))))
+    print('%-20s %-10s %9s %10s %9s' % ('selection', 'read', 'time, s', 'peak RSS', 'rows'))
+    ctx = multiprocessing.get_context('spawn')
+    for name, clauses, years in SELECTIONS:
+        for way, func in (('whole CSV', whole_csv), ('store', store), ('scan', scan)):
+            with ctx.Pool(1) as pool:
+                t, rss, rows = pool.apply(measure, (func, path, clauses, years))
+            print('%-20s %-10s %9.2f %10s %9d' % (name, way, t, format_size(rss), rows))
@@ -0,0 +1,107 @@
+# The ticks of chart 02's grid with 20 and 85 panels, styled three ways: the loops the chart used to run on every panel
+# (for label in ax.get_xticklabels(): label.set(...), the spines one by one), budgetviz.themes.style_axes on all the
+# panels at once (tick_params, with the axes made in the theme's weight_context), and the theme's rc settings
+# (theme_context) with the grid built and saved in them (they leave out the spines' widths, which rcParams can't give). The
+# panels are random stacked areas, like the chart's. The first time column covers the styling alone, the second covers
+# building, laying out and saving the grid (PNG, in memory, at a low DPI). The times are the process's CPU time; the ways
+# take turns in every repeat, after a garbage collection, and the best time of each is shown.
+#
+# Run from the root of the repo:  python benchmarks/bench_themes.py [--repeat 5]
+
+import argparse
+import gc
+import io
+import math
+import os
+import sys
+import time
+from contextlib import nullcontext
+
+import matplotlib
+matplotlib.use('Agg')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from budgetviz.figures import headless
+from budgetviz.multiples import SmallMultiples
+from budgetviz.plots import stacked_area
+from budgetviz.themes import style_axes, theme_context, weight_context
+
+from grid_panels import COLORS, DPI, YEARS, make_panels
+
+
+THEME = 'small_multiples'
+
+
+# THE WAYS TO STYLE THE TICKS *************************************************************************************************
+
+
+def label_loops(axes):
+    for ax in axes:
+        for label in ax.get_xticklabels():
+            label.set(fontsize=12, fontweight='bold', color='#4f5b66')
+        for label in ax.get_yticklabels():
+            label.set(fontsize=13)
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+        for side in ('left', 'bottom'):
+            ax.spines[side].set_zorder(3)
+            ax.spines[side].set_linewidth(1.2)
+
+
+def themed(axes):
+    style_axes(axes, THEME)
+
+
+def rc_only(axes):
+    pass # the theme_context the grid is made in does it all
+
+
+# the styling, the context the axes are made in (the weight of their labels), and the one the whole grid is made in
+WAYS = [('label loops', label_loops, None, None), ('style_axes', themed, weight_context, None),
+        ('theme_context', rc_only, None, theme_context)]
+
+
+def in_context(context):
+    return context(THEME) if context else nullcontext()
+
+
+def build_and_save(panels, style, axes_context=None, context=None):
+    gc.collect()
+    start = time.process_time()
+    with in_context(context):
+        with in_context(axes_context):
+            grid = SmallMultiples(math.ceil(len(panels) / 5), 5)
+        for ax in grid.shared_axes():
+            ax.yaxis.set_major_formatter('{x:1.0f}B')
+        grid.set_limits(xlim=(2010.99, 2021.01), ylim=(0, 600))
+        styling = time.process_time()
+        style(grid.axes)
+        styling = time.process_time() - styling
+        fig = grid.draw(lambda ax, i: stacked_area(ax, YEARS, panels[i], COLORS), range(len(panels)))
+        fig.tight_layout()
+        fig.savefig(io.BytesIO(), format='png', dpi=DPI)
+    return styling, time.process_time() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the ways to style the ticks of a grid of panels.')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print('%7s %-14s %10s %10s' % ('panels', 'styling', 'style, s', 'total, s'))
+    with headless():
+        for n_panels in (20, 85):
+            panels = make_panels(n_panels)
+            times = {name: [] for name, style, axes_context, context in WAYS}
+            for _ in range(args.repeat):
+                for name, style, axes_context, context in WAYS:
+                    times[name].append(build_and_save(panels, style, axes_context, context))
+            for name, style, axes_context, context in WAYS:
+                print('%7d %-14s %10.3f %10.2f' % (n_panels, name, min(t[0] for t in times[name]),
+                                                  min(t[1] for t in times[name])))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,14 @@
+# The panels the small-multiples benchmarks draw: random stacked areas of six series over the years 2011-2021, like chart
+# 02's, saved at a low DPI.
+
+import numpy as np
+
+
+COLORS = ['#93c2d3', '#faaa6d', '#fdd0a9', '#F7C815', '#f78562', '#30637f']
+YEARS = np.arange(2011, 2022)
+DPI = 30
+
+
+def make_panels(n_panels, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0, 100, (n_panels, len(COLORS), len(YEARS)))
@@ -0,0 +1,2 @@
+# Shared helpers for the chart scripts in the root of the repo (01_… through 08_…).
+# The scripts themselves stay standalone; everything they have in common lives here.
@@ -0,0 +1,191 @@
+# Animate a chart over the years, redrawing only what changes from one frame to the next.
+
+# Any chart that can be swept (see budgetviz.sweep: chart 04 over 2011-2021, 03 and 08 too) can be animated. Its
+# update(frame) returns the artists a frame changes (for chart 04 the bubbles, the region labels and the title), and they
+# are the only ones drawn per frame. Everything else is drawn once, and its pixels are kept with canvas.copy_from_bbox: the
+# axes, grid, ticks, legend and arrows. Each frame restores those pixels and draws the changed artists on top. This is
+# blitting, the way matplotlib.animation.FuncAnimation(blit=True) animates on screen, but here the frames are encoded as
+# they come. A GIF is written by Pillow. An MP4 (or any other ffmpeg format) is written by ffmpeg if it is installed; the
+# raw RGBA pixels are piped to it. The canvas covers the tight bbox of the first frame, from the bbox cache, as the frames
+# of a sweep do. With --show, the animation plays in a window through FuncAnimation instead.
+#
+# Run from the root of the repo:  python -m budgetviz.animate [chart name] [-o OUTPUT] [--fps FPS] [--dpi DPI] [--show]
+# e.g. python -m budgetviz.animate 04 -o bubbles.gif --dpi 100
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from budgetviz.figures import close_figure, headless
+from budgetviz.output import _adjust_bbox, tight_bbox
+from budgetviz.render import format_size, load_chart, peak_rss, select_charts
+from budgetviz.sweep import frame_bbox, frame_label, sweep_layout
+
+
+DEFAULT_CHART = '04'
+
+FPS = 2
+
+ANIMATION_DPI = 100
+
+
+def ffmpeg_path():
+    import matplotlib
+    return shutil.which(matplotlib.rcParams['animation.ffmpeg_path'])
+
+
+# The file an animation is written to by default: an MP4 if ffmpeg is there to encode it, a GIF otherwise.
+def animation_path(output):
+    name = os.path.splitext(os.path.basename(output))[0]
+    return name + ('.mp4' if ffmpeg_path() else '.gif')
+
+
+# THE FRAMES ******************************************************************************************************************
+
+
+def _by_zorder(artists):
+    return sorted(artists, key=lambda artist: artist.get_zorder())
+
+
+# Draws the frames of a figure made by build_sweep. It yields (frame, pixels, seconds) for each frame, where pixels is the
+# RGBA array of the canvas. The array is overwritten by the next frame, so copy it to keep it. The first frame's time
+# includes drawing the background. layout names the first frame's layout for the bbox cache (see budgetviz.sweep); without
+# it the box is computed.
+def blitted_frames(fig, update, frames, dpi=ANIMATION_DPI, layout=None):
+    adjust_bbox = _adjust_bbox()
+    frames = list(frames)
+    canvas = fig.canvas
+    start = time.perf_counter()
+    fig.set_dpi(dpi)
+    animated = update(frames[0])
+    # the canvas is grown to the tight bbox, as savefig(bbox_inches='tight') does for one image; a matplotlib without
+    # adjust_bbox (see budgetviz.output) animates the whole figure
+    if adjust_bbox is not None:
+        adjust_bbox(fig, frame_bbox(fig, layout, dpi) if layout is not None else tight_bbox(fig))
+    for artist in animated:
+        artist.set_animated(True) # left out of canvas.draw()
+    canvas.draw()
+    background = canvas.copy_from_bbox(fig.bbox)
+    for i, frame in enumerate(frames):
+        if i:
+            start = time.perf_counter()
+            animated = update(frame)
+        canvas.restore_region(background)
+        for artist in _by_zorder(animated):
+            fig.draw_artist(artist)
+        yield frame, np.asarray(canvas.buffer_rgba()), time.perf_counter() - start
+
+
+# THE ENCODERS ****************************************************************************************************************
+
+
+# Writes the frames (RGBA arrays) to a GIF with Pillow. Pillow asks for the frames one by one as it encodes them. Returns
+# the file name.
+def write_gif(pixels, filename, fps=FPS):
+    from PIL import Image
+    images = (Image.fromarray(frame).convert('RGB') for frame in pixels) # converting copies the pixels
+    first = next(images)
+    first.save(filename, save_all=True, append_images=images, duration=int(1000 / fps), loop=0)
+    return filename
+
+
+# Writes the frames (RGBA arrays) to a video with ffmpeg. The format comes from the file's extension. H.264 wants even
+# sizes, so an odd last row or column is dropped. Returns the file name.
+def write_video(pixels, filename, fps=FPS):
+    ffmpeg = ffmpeg_path()
+    if ffmpeg is None:
+        raise RuntimeError('ffmpeg is not installed; write a .gif instead, or install ffmpeg')
+    process = None
+    try:
+        for frame in pixels:
+            height, width = frame.shape[0] // 2 * 2, frame.shape[1] // 2 * 2
+            if process is None:
+                process = subprocess.Popen([ffmpeg, '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgba',
+                                            '-s', '%dx%d' % (width, height), '-r', str(fps), '-i', '-',
+                                            '-pix_fmt', 'yuv420p', filename], stdin=subprocess.PIPE)
+            process.stdin.write(np.ascontiguousarray(frame[:height, :width]).tobytes())
+    finally:
+        if process is not None:
+            process.stdin.close()
+            if process.wait():
+                raise RuntimeError('ffmpeg failed to write %s' % filename)
+    return filename
+
+
+# Renders a chart's frames (all of sweep_frames by default) and encodes them into filename, a GIF or a video by its
+# extension. Returns the per-frame times, as (frame, seconds).
+def animate(name, filename=None, frames=None, fps=FPS, dpi=ANIMATION_DPI):
+    module = load_chart(name)
+    data = module.prepare_data()
+    frames = module.sweep_frames(data) if frames is None else frames
+    filename = filename or animation_path(module.OUTPUT)
+    write = write_gif if filename.lower().endswith('.gif') else write_video
+    times = []
+
+    def pixels(frames):
+        for frame, rgba, seconds in frames:
+            times.append((frame, seconds))
+            yield rgba
+
+    with headless():
+        fig, update = module.build_sweep(data)
+        try:
+            write(pixels(blitted_frames(fig, update, frames, dpi, sweep_layout(name, frames[0]))), filename, fps)
+        finally:
+            close_figure(fig)
+    return times
+
+
+# Plays the animation in a pyplot window. FuncAnimation blits the artists that update returns.
+def show(name, fps=FPS):
+    import matplotlib.pyplot as plt
+    from matplotlib.animation import FuncAnimation
+    module = load_chart(name)
+    data = module.prepare_data()
+    fig, update = module.build_sweep(data)
+    animation = FuncAnimation(fig, update, frames=module.sweep_frames(data), interval=1000 / fps, blit=True)
+    plt.show()
+    return animation
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Animate a chart over the years it can be swept over.')
+    parser.add_argument('chart', nargs='?', default=DEFAULT_CHART, help='the chart (a name or its beginning, e.g. 04)')
+    parser.add_argument('-o', '--output', default=None,
+                        help='the animation file, .gif or a video (.mp4...); an .mp4 if ffmpeg is installed by default')
+    parser.add_argument('--fps', type=float, default=FPS, help='frames per second')
+    parser.add_argument('--dpi', type=int, default=ANIMATION_DPI)
+    parser.add_argument('--show', action='store_true', help='play the animation in a window instead of writing it')
+    args = parser.parse_args(argv)
+
+    name = select_charts([args.chart])[0]
+    if not hasattr(load_chart(name), 'build_sweep'):
+        parser.error('%s cannot be animated: it has no build_sweep()' % name)
+    if args.show:
+        show(name, args.fps)
+        return 0
+    if args.output and not args.output.lower().endswith('.gif') and ffmpeg_path() is None:
+        parser.error('ffmpeg is not installed; only a .gif can be written')
+
+    import matplotlib
+    matplotlib.use('Agg')
+
+    start = time.perf_counter()
+    filename = args.output or animation_path(load_chart(name).OUTPUT)
+    print('%-50s %-10s %9s' % ('chart', 'frame', 'time, s'))
+    times = animate(name, filename, fps=args.fps, dpi=args.dpi)
+    for frame, seconds in times:
+        print('%-50s %-10s %9.3f' % (name, frame_label(frame), seconds))
+    print('%-50s %-10s %9.3f' % ('mean per frame', '', sum(seconds for frame, seconds in times) / len(times)))
+    print('%-50s %-10s %9.2f' % ('total', '', time.perf_counter() - start))
+    print('%s: %d kB, peak RSS: %s' % (filename, os.path.getsize(filename) // 1024, format_size(peak_rss())))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+# Render only the charts whose inputs have changed.
+
+# A chart's image depends on the slice of the dataset it selects (its budget_pivot calls: the codes, the years, the regions)
+# and on its code (its script and the budgetviz modules it runs). Each time a chart is rendered, both are fingerprinted and
+# kept in a manifest next to the images: a digest of the rows of every selection (budgetviz.pivots.selection_fingerprint)
+# and of every source file. The next build computes them again and renders only the stale charts: the ones never built,
+# whose image is gone, whose code has changed, or whose rows have (a new year appended, a region corrected...). A
+# selection is hashed by its rows, not by the whole CSV, so a change to the rows a chart doesn't read leaves it as it is;
+# if the CSV hasn't changed at all, the selections aren't even hashed (a chart left as it is by a new CSV is recorded with
+# the new one, so that holds for the next build too). With --dry-run, the stale charts are listed with
+# the reasons and nothing is rendered.
+#
+# Run from the root of the repo:  python -m budgetviz.build [chart names...] [-j JOBS] [-o OUTPUT_DIR] [--dry-run] [--force]
+# e.g. python -m budgetviz.build --dry-run
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+from budgetviz.data import DATA_PATH, dataset_fingerprint
+from budgetviz.pivots import selection_fingerprint
+from budgetviz.render import DPI, ROOT, format_size, render_all, select_charts
+
+
+MANIFEST = '.build_manifest.json'
+
+MANIFEST_VERSION = 1
+
+# the operators of the normalized clauses (budgetviz.codes.normalize), as they are printed
+OPERATORS = {'eq': '==', 'in': 'in', 'ne': '!=', 'gt': '>', 'ge': '>=', 'lt': '<', 'le': '<='}
+
+
+# THE MANIFEST ****************************************************************************************************************
+
+
+def manifest_path(output_dir=None):
+    return os.path.join(output_dir or '.', MANIFEST)
+
+
+# The records of the charts built so far, by chart name; a missing or unreadable manifest (or one of another version) is an
+# empty one, and every chart is rebuilt.
+def read_manifest(filename):
+    try:
+        with open(filename) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return dict()
+    return manifest.get('charts', dict()) if manifest.get('version') == MANIFEST_VERSION else dict()
+
+
+def write_manifest(charts, filename):
+    tmp = filename + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'version': MANIFEST_VERSION, 'charts': charts}, f, indent=1, sort_keys=True)
+    os.replace(tmp, filename)
+
+
+# THE FINGERPRINTS ************************************************************************************************************
+
+
+def file_fingerprint(filename):
+    try:
+        with open(filename, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+# The digests of the selections are shared by the charts of one build (charts 04, 05 and 08 select the same rows), keyed
+# by the selection as JSON, so a selection read back from the manifest finds the digest of the same one just recorded.
+class SelectionDigests:
+
+    def __init__(self, path=DATA_PATH):
+        self.path = path
+        self.digests = dict()
+
+    def __getitem__(self, selection):
+        key = json.dumps(selection)
+        if key not in self.digests:
+            self.digests[key] = selection_fingerprint(selection, self.path)
+        return self.digests[key]
+
+
+# What the manifest keeps of a chart just rendered (a result of budgetviz.render.render_chart).
+def chart_record(result, digests):
+    return {'output': result['output'], 'dpi': DPI, 'dataset': dataset_fingerprint(digests.path),
+            'sources': {source: file_fingerprint(os.path.join(ROOT, source)) for source in result['sources']},
+            'selections': [{'selection': selection, 'digest': digests[selection]}
+                           for selection in json.loads(json.dumps(result['selections']))]}
+
+
+# A selection as a filter, e.g. 'i1 == 1 & r1 != 0 & r3 == 0 | i1 == 1 & i3 == 9, years 2011, 2021'.
+def describe(selection):
+    clauses, years, regions = selection
+    text = ' | '.join(' & '.join('%s %s %s' % (code, OPERATORS[op], tuple(value) if op == 'in' else value)
+                                 for code, op, value in clause) or 'all' for clause in clauses)
+    if years is not None:
+        text += ', years ' + ', '.join(str(year) for year in years)
+    if regions is not None:
+        text += ', %d region(s)' % len(regions)
+    return text
+
+
+# Why a chart has to be rendered again, given its record in the manifest; nothing if it's up to date.
+def stale_reasons(record, digests):
+    if record is None:
+        return ['never built']
+    reasons = []
+    if not os.path.exists(record['output']):
+        reasons.append('no image')
+    if record['dpi'] != DPI:
+        reasons.append('DPI %s -> %s' % (record['dpi'], DPI))
+    changed = [source for source, digest in sorted(record['sources'].items())
+               if file_fingerprint(os.path.join(ROOT, source)) != digest]
+    if changed:
+        reasons.append('code changed: ' + ', '.join(changed))
+    if record['dataset'] != dataset_fingerprint(digests.path):
+        reasons += ['data changed: ' + describe(item['selection']) for item in record['selections']
+                    if digests[item['selection']] != item['digest']]
+    return reasons
+
+
+# The record of a chart that is up to date with a dataset that has changed (in rows it doesn't read): the new fingerprint of
+# the dataset and the digests of its selections, so the next build takes the quick way again when the CSV is the same.
+# Returns whether the record was changed.
+def refresh_record(record, digests):
+    fingerprint = dataset_fingerprint(digests.path)
+    if record['dataset'] == fingerprint:
+        return False
+    record['dataset'] = fingerprint
+    for item in record['selections']:
+        item['digest'] = digests[item['selection']]
+    return True
+
+
+# THE BUILD *******************************************************************************************************************
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render the charts whose data or code have changed.')
+    parser.add_argument('charts', nargs='*', help='the charts to build (a name or its beginning, e.g. 02); all by default')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='the number of worker processes')
+    parser.add_argument('-o', '--output-dir', default=None, help='the folder for the images (the current one by default)')
+    parser.add_argument('-n', '--dry-run', action='store_true', help='list the stale charts and why, render nothing')
+    parser.add_argument('--force', action='store_true', help='render the charts even if they are up to date')
+    args = parser.parse_args(argv)
+
+    charts = select_charts(args.charts)
+    filename = manifest_path(args.output_dir)
+    manifest = read_manifest(filename)
+    digests = SelectionDigests()
+
+    stale = []
+    refreshed = False
+    for name in charts:
+        reasons = stale_reasons(manifest.get(name), digests)
+        print('%-50s %s' % (name, '; '.join(reasons) if reasons else 'up to date'))
+        if reasons or args.force:
+            stale.append(name)
+        elif not args.dry_run:
+            refreshed = refresh_record(manifest[name], digests) or refreshed
+    if args.dry_run:
+        return 0
+    if not stale:
+        if refreshed:
+            write_manifest(manifest, filename)
+        return 0
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    start = time.perf_counter()
+    failed = 0
+    print()
+    print('%-50s %9s %10s' % ('chart', 'wall, s', 'peak RSS'))
+    try:
+        for result in render_all(stale, args.jobs, args.output_dir):
+            print('%-50s %9.2f %10s' % (result['chart'], result['wall'], format_size(result['peak_rss'])))
+            if result['error']:
+                failed += 1
+                print('    ' + result['error'])
+                manifest.pop(result['chart'], None) # a failed chart stays stale
+            else:
+                manifest[result['chart']] = chart_record(result, digests)
+    finally:
+        write_manifest(manifest, filename) # the charts done so far are kept even if the build is interrupted
+    print('%-50s %9.2f' % ('total', time.perf_counter() - start))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
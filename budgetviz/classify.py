@@ -0,0 +1,120 @@
+# Vectorized classification of the regions.
+
+# The charts put every (year, region) row into a class: an income group by the year's income quantiles (chart 04), a donor
+# or dependent class by the net money flow with the federal center (chart 05). Instead of a Python function per row
+# (DataFrame.apply with axis=1), the rows are classified all at once with array comparisons, and the classes come back as
+# ordered categoricals: the category order is the order the charts sort and color the classes in.
+
+import numpy as np
+import pandas as pd
+
+
+INCOME_GROUPS = ['high', 'higher_avg', 'lower_avg', 'low', 'nodata']
+FLOW_CLASSES = ['donor_100_and_more', 'donor_up_to_100', 'dependent_up_to_100', 'dependent_100_and_more', 'no_data']
+
+
+def _like(values, categorical):
+    # a Series in -> a Series with the same index out, anything else -> the categorical itself
+    if isinstance(values, pd.Series):
+        return pd.Series(categorical, index=values.index, name=values.name)
+    return categorical
+
+
+def _labels_to_categorical(codes, categories):
+    # codes are positions in `categories`, -1 for "no class"
+    return pd.Categorical.from_codes(codes, categories=categories, ordered=True)
+
+
+# Bins the values by thresholds: a value gets labels[i] when it is >= edges[i-1] and < edges[i] (labels has one item more
+# than edges, and the edges are ascending). The edges are either shared by all the values (1-D, binned with
+# np.searchsorted) or given per value (2-D, one row of edges per value, e.g. the thresholds of the value's year). A NaN
+# value or a NaN edge leaves the value without a label.
+def bin_values(values, edges, labels):
+    x = np.asarray(values, dtype='float64')
+    edges = np.asarray(edges, dtype='float64')
+    if edges.ndim == 1:
+        codes = np.searchsorted(edges, x, side='right')
+        missing = np.isnan(x) | np.isnan(edges).any()
+    else:
+        codes = (x[:, None] >= edges).sum(axis=1) # per-row edges: count the thresholds the value has reached
+        missing = np.isnan(x) | np.isnan(edges).any(axis=1)
+    codes = np.where(missing, -1, codes)
+    return _like(values, _labels_to_categorical(codes, labels))
+
+
+# The region's income group by the quantiles of its year (chart 04):
+# "high" - in the top 20% by income per capita (>= the 80% quantile);
+# "higher_avg" - from the 60% quantile up to the top 20%;
+# "lower_avg" - from the 40% quantile up to the 60% one;
+# "low" - the bottom 40%;
+# "nodata" - no income data (zero). A row with missing income or quantiles gets no group.
+# The conditions are the ones of the original row-wise rules, checked in the same order, so every edge case (a value equal
+# to a quantile, equal quantiles) lands in the same group.
+def income_groups(income, q40, q60, q80):
+    x = np.asarray(income, dtype='float64')
+    q40, q60, q80 = (np.asarray(q, dtype='float64') for q in (q40, q60, q80))
+    codes = np.select([x == 0,
+                       x >= q80,
+                       (q60 <= x) & (x < q80),
+                       (q60 > x) & (x >= q40),
+                       x < q40],
+                      [4, 0, 1, 2, 3], default=-1)
+    return _like(income, _labels_to_categorical(codes, INCOME_GROUPS))
+
+
+# The region's role by its net money flow with the federal center, as a share of its own revenue (chart 05): it gives away
+# (donor) or gets (dependent) the equivalent of more or less than 100% of its revenue; no flow at all means no data. A flow
+# exactly equal to the revenue, or a missing value, gets no class - just as in the original row-wise rules.
+def flow_classes(flow, own_revenue):
+    f = np.asarray(flow, dtype='float64')
+    rev = np.asarray(own_revenue, dtype='float64')
+    codes = np.select([f == 0,
+                       f <= -rev,
+                       (-rev < f) & (f < 0),
+                       (0 < f) & (f < rev),
+                       f > rev],
+                      [4, 0, 1, 2, 3], default=-1)
+    return _like(flow, _labels_to_categorical(codes, FLOW_CLASSES))
+
+
+# The position of each row's class in the category order, for sorting; rows without a class go after all the classes.
+def class_order(classes):
+    cat = classes.cat if isinstance(classes, pd.Series) else classes
+    codes = np.asarray(cat.codes)
+    order = np.where(codes < 0, len(cat.categories), codes).astype('int64')
+    if isinstance(classes, pd.Series):
+        return pd.Series(order, index=classes.index)
+    return order
+
+
+# THE QUANTILE BANDS **********************************************************************************************************
+
+
+# The quantiles of each group (by default the first index level, i.e. the year), broadcast back to every row of the group:
+# one column per quantile, aligned to the values' index, so they can be compared with the values row by row (as the
+# thresholds of income_groups or the edges of bin_values). All the groups and quantiles come from a single grouped pass.
+#   quantile_bands(regional_flows['income_per_cap'], [0.4, 0.6, 0.8], prefix='inc_quantile_')
+# gives the columns inc_quantile_40, inc_quantile_60 and inc_quantile_80 with each year's quantiles. A row whose group key
+# is NaN belongs to no group, and its quantiles are NaN.
+def quantile_bands(values, quantiles, by=0, prefix='q'):
+    grouped = values.groupby(level=by) if _is_level(values, by) else values.groupby(by)
+    table = grouped.quantile(list(quantiles)).unstack() # one row per group, one column per quantile
+    rows = grouped.ngroup().values # the position of each row's group in the table (NaN for a NaN key)
+    grouped_rows = ~np.isnan(rows)
+    columns = [prefix + '%g' % (q * 100) for q in quantiles]
+    bands = np.full((len(values), len(columns)), np.nan)
+    bands[grouped_rows] = table[list(quantiles)].values[rows[grouped_rows].astype(int)]
+    return pd.DataFrame(bands, index=values.index, columns=columns)
+
+
+# The values binned by the quantiles of their group, e.g. the regions' spending per capita into the quartiles of each year:
+#   quantile_classes(spending, [0.25, 0.5, 0.75], ['Q1', 'Q2', 'Q3', 'Q4'])
+# labels has one item more than quantiles; the quantiles are ascending. See bin_values for the bins' edges.
+def quantile_classes(values, quantiles, labels, by=0):
+    edges = quantile_bands(values, sorted(quantiles), by=by)
+    return bin_values(values, edges.values, labels)
+
+
+def _is_level(values, by):
+    # a level number or a level name of the index (rather than an array of group keys)
+    return isinstance(by, int) or (isinstance(by, str) and by in values.index.names)
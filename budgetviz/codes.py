@@ -0,0 +1,177 @@
+# An index over the budget classification codes.
+
+# Each row of the dataset carries its place in the budget classification: i1 (regional/federal level), i2, i3 (revenue,
+# spending, population...), r1..r5 for the revenue items and s1..s2 for the spending items. The scripts select their rows by
+# these codes. Here we sort the rows once by the composite key (i1, i2, i3, r1..r5, s1, s2), so every code prefix becomes a
+# contiguous range of the sorted rows, and a selection is resolved level by level with binary searches inside those ranges
+# instead of scanning the whole table.
+
+import operator
+
+import numpy as np
+
+
+CODE_COLUMNS = ['i1', 'i2', 'i3', 'r1', 'r2', 'r3', 'r4', 'r5', 's1', 's2']
+
+
+# Predicates for the comparisons other than "equal to" and "one of" that the scripts need; they are applied to the distinct
+# codes found on a level, never to the rows themselves. Unlike a lambda, they compare equal when they mean the same thing,
+# so a selection that uses them can serve as a cache key.
+class Compare:
+
+    OPERATORS = {'ne': operator.ne, 'gt': operator.gt, 'ge': operator.ge, 'lt': operator.lt, 'le': operator.le}
+
+    def __init__(self, op, code):
+        self.op = op
+        self.code = code
+
+    def __call__(self, value):
+        return self.OPERATORS[self.op](value, self.code)
+
+    def __eq__(self, other):
+        return isinstance(other, Compare) and (self.op, self.code) == (other.op, other.code)
+
+    def __hash__(self):
+        return hash((self.op, self.code))
+
+    def __repr__(self):
+        return '%s(%r)' % (self.op, self.code)
+
+
+def ne(code):
+    return Compare('ne', code)
+
+
+def gt(code):
+    return Compare('gt', code)
+
+
+# A selection in one canonical form: the clauses as sorted tuples of (code, condition), with collections turned into sorted
+# tuples, so that the same filter written differently (another clause order, a list instead of a tuple, a range) gives the
+# same key.
+def normalize(clauses):
+    normalized = set()
+    for clause in clauses:
+        items = []
+        for code, cond in sorted(clause.items()):
+            if cond is None:
+                continue
+            if isinstance(cond, Compare):
+                items.append((code, cond.op, cond.code))
+            elif callable(cond):
+                raise TypeError('%s: use ne()/gt() or a collection of codes instead of a function' % code)
+            elif np.iterable(cond) and len(set(cond)) != 1:
+                items.append((code, 'in', tuple(sorted(set(int(v) for v in cond)))))
+            elif np.iterable(cond):
+                items.append((code, 'eq', int(next(iter(cond)))))
+            else:
+                items.append((code, 'eq', int(cond)))
+        normalized.add(tuple(items))
+    return tuple(sorted(normalized))
+
+
+# The clauses back from their normalized form, e.g. once it has been through JSON (with lists for the tuples).
+def denormalize(normalized):
+    return tuple({code: value if op == 'eq' else tuple(value) if op == 'in' else Compare(op, value)
+                  for code, op, value in clause} for clause in normalized)
+
+
+# The rows of some code columns (a dataframe, a chunk of one, or a mapping of column names to arrays) that match a selection,
+# as a boolean mask; the clauses are those of CodeIndex.rows below. Each condition is checked on the whole arrays at once,
+# for tables that aren't indexed, such as the chunks of a CSV being read (see budgetviz.data.scan_rows).
+def match_rows(columns, *clauses, **predicates):
+    if predicates:
+        clauses = clauses + (predicates,)
+    mask = np.zeros(len(columns[next(iter(columns))]), dtype=bool)
+    for clause in normalize(clauses):
+        part = None
+        for code, op, value in clause:
+            codes = np.asarray(columns[code])
+            if op == 'eq':
+                cond = codes == value
+            elif op == 'in':
+                cond = np.isin(codes, value)
+            else:
+                cond = Compare.OPERATORS[op](codes, value)
+            part = cond if part is None else part & cond
+        if part is None: # an empty clause matches everything
+            return np.ones_like(mask)
+        mask |= part
+    return mask
+
+
+# The code columns are taken from a dataframe or from any mapping of column names to arrays (the store of budgetviz.data).
+def sort_order(columns):
+    # the row positions in the order of the composite key; lexsort takes the last key as the primary one
+    names = [c for c in CODE_COLUMNS if c in columns]
+    return np.lexsort([np.asarray(columns[c]) for c in reversed(names)])
+
+
+class CodeIndex:
+
+    def __init__(self, columns, order=None, keys=None):
+        self.columns = [c for c in CODE_COLUMNS if c in columns]
+        self.order = sort_order(columns) if order is None else order
+        # the sorted codes are kept column by column, so a range of one level is a contiguous slice for searchsorted; they
+        # can be passed in already sorted (the data cache keeps them)
+        if keys is None:
+            self.keys = [np.ascontiguousarray(np.asarray(columns[c])[self.order]) for c in self.columns]
+        else:
+            self.keys = [keys[c] for c in self.columns]
+
+    def __len__(self):
+        return len(self.order)
+
+    # A selection is given either as keyword arguments (one AND-clause) or as several dicts (OR-ed clauses), e.g.
+    #   codes.rows(i1=1, r1=3, r3=(1, 3, 7))           -> i1 == 1 & r1 == 3 & r3 in (1, 3, 7), any r4, r5...
+    #   codes.rows(dict(i1=1, i3=5), dict(i1=1, i3=9)) -> (i1 == 1 & i3 == 5) | (i1 == 1 & i3 == 9)
+    # A code can be matched by a number, a collection of numbers (a tuple, a list, a range), or a predicate such as ne(0).
+    # The result is the row positions in the original order, ready for df.iloc.
+    def rows(self, *clauses, **predicates):
+        if predicates:
+            clauses = clauses + (predicates,)
+        parts = [self.order[lo:hi] for clause in clauses for lo, hi in self.ranges(**clause)]
+        if not parts:
+            return np.array([], dtype=np.intp)
+        rows = np.concatenate(parts)
+        return np.unique(rows) if len(clauses) > 1 else np.sort(rows) # OR-ed clauses may overlap
+
+    def count(self, **predicates):
+        return sum(hi - lo for lo, hi in self.ranges(**predicates))
+
+    # The [lo, hi) ranges of the sorted rows that match one AND-clause.
+    def ranges(self, **predicates):
+        unknown = set(predicates) - set(self.columns)
+        if unknown:
+            raise KeyError('not a classification code: ' + ', '.join(sorted(unknown)))
+        conditions = [predicates.get(c) for c in self.columns]
+        # below the last constrained level every row of a range matches, so we stop descending there
+        depth = max([level + 1 for level, cond in enumerate(conditions) if cond is not None], default=0)
+        out = []
+        self._descend(conditions, depth, 0, 0, len(self.order), out)
+        return out
+
+    def _descend(self, conditions, depth, level, lo, hi, out):
+        if level == depth:
+            if out and out[-1][1] == lo:
+                out[-1] = (out[-1][0], hi) # neighbouring ranges are merged
+            else:
+                out.append((lo, hi))
+            return
+        keys = self.keys[level][lo:hi] # sorted, as all the levels above are fixed within the range
+        cond = conditions[level]
+        if cond is None or callable(cond):
+            # walk through the distinct codes of this level, one binary search per code
+            pos = 0
+            while pos < len(keys):
+                value = keys[pos]
+                end = np.searchsorted(keys, value, side='right')
+                if cond is None or cond(value):
+                    self._descend(conditions, depth, level + 1, lo + pos, lo + end, out)
+                pos = end
+        else:
+            values = sorted(set(cond)) if np.iterable(cond) else [cond]
+            for value in values:
+                start, end = np.searchsorted(keys, value, side='left'), np.searchsorted(keys, value, side='right')
+                if start < end:
+                    self._descend(conditions, depth, level + 1, lo + start, lo + end, out)
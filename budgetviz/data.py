@@ -0,0 +1,408 @@
+# Data access for russian_budget_data.csv.
+
+# The dataset is a long table: one row per (budget item, region, year) with the item's name in `index`, its value in `value`,
+# and the budget classification codes (i1..i3, r1..r5, s1..s2) that the chart scripts filter on. Every chart used to parse
+# the whole CSV on its own; here we parse it once into typed columns and keep a binary copy (.npz) next to the CSV, so the
+# next run only has to map the arrays back in. The cache also keeps the rows' order by classification code and the sorted
+# codes themselves, which the code index (budgetviz.codes) is built from.
+
+# The cached arrays are memory-mapped, not read: the processes that render the charts side by side (budgetviz.render) share
+# a single copy of them in the page cache, and a selection only touches the rows it takes. With pyarrow installed, the copy
+# is an uncompressed Feather file (Arrow IPC: one record batch, the names as dictionary columns) rather than an .npz; it's
+# mapped the same way, each column handed to numpy without a copy, and the file can be opened by any Arrow reader as well.
+
+# A CSV too large to be parsed whole (and that has no cache yet) is read in chunks instead (see scan_rows): only the columns
+# a selection needs are parsed, the codes, years and regions are filtered chunk by chunk as it's read, and only the rows
+# that pass are kept, so the memory it takes follows the selection, not the file.
+
+import hashlib
+import json
+import os
+import struct
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from budgetviz.codes import CODE_COLUMNS, CodeIndex, match_rows, sort_order
+from budgetviz.stages import stage
+
+
+DATA_PATH = 'russian_budget_data.csv'
+
+CATEGORY_COLUMNS = ['index', 'region_eng']
+
+CACHE_VERSION = 3
+
+CACHE_FORMAT = None # 'feather' or 'npz'; by default, feather when pyarrow is installed
+
+STREAM_BYTES = 2 * 1024**3 # a CSV larger than this, with no cache next to it, is read in chunks (see scan_rows)
+SCAN_CHUNK_ROWS = 500_000
+
+_loaded = dict() # the stores already loaded in this process, by the CSV path
+_hashed = dict() # the hashes of the CSVs read in chunks, by (path, size, mtime)
+
+
+# THE CACHE *******************************************************************************************************************
+
+
+def cache_format():
+    if CACHE_FORMAT is not None:
+        return CACHE_FORMAT
+    try:
+        _pyarrow()
+    except ImportError:
+        return 'npz'
+    return 'feather'
+
+
+def cache_path(path):
+    return os.path.splitext(path)[0] + '.' + cache_format()
+
+
+def file_hash(path, chunk_size=1 << 20):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _typed_frame(df):
+    # categorical names, the smallest integer types for the codes and the year (the codes are 0..12, so int8 is enough;
+    # a column with gaps stays float), and float64 for the values
+    for col in df.columns:
+        if col in CATEGORY_COLUMNS or df[col].dtype == object:
+            df[col] = df[col].astype('category')
+        elif col == 'value':
+            df[col] = df[col].astype('float64')
+        else:
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+
+
+def _save_cache(store, path, meta):
+    save = _save_feather if cache_format() == 'feather' else _save_npz
+    tmp = cache_path(path) + '.tmp'
+    save(store, tmp, meta)
+    os.replace(tmp, cache_path(path)) # an interrupted write never leaves a broken cache behind, and the processes that
+                                      # still have the old file mapped keep reading the old file
+
+
+def _save_npz(store, filename, meta):
+    # each column is stored as a plain array; a categorical is split into its codes and its categories, so the file can be
+    # read back (and mapped) without pickle
+    arrays = {'__row__': store['row_index'], '__code_order__': store['order'],
+              '__columns__': np.array(store['columns'], dtype=str)}
+    for col in store['columns']:
+        if col in store['categories']:
+            arrays['codes:' + col] = store['arrays'][col]
+            arrays['categories:' + col] = np.asarray(store['categories'][col]).astype(str)
+        else:
+            arrays['values:' + col] = store['arrays'][col]
+    for col, keys in store['keys'].items():
+        arrays['keys:' + col] = keys
+    for key, val in meta.items():
+        arrays['meta:' + key] = np.array(val)
+
+    with open(filename, 'wb') as f: # np.savez would append .npz to a bare file name
+        np.savez(f, **arrays)
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc
+    except ImportError:
+        raise ImportError('a Feather cache needs pyarrow (pip install pyarrow), or set CACHE_FORMAT to npz') from None
+    return pa
+
+
+def _save_feather(store, filename, meta):
+    # the same arrays as in an .npz, as the columns of one table (they all have a value per row): a categorical becomes a
+    # dictionary column, its codes the indices; the metadata goes into the schema. A single uncompressed record batch keeps
+    # every column one contiguous buffer in the file, so it can be mapped.
+    pa = _pyarrow()
+    names, arrays = ['__row__', '__code_order__'], [pa.array(store['row_index']), pa.array(store['order'])]
+    for col in store['columns']:
+        names.append(col)
+        if col in store['categories']:
+            arrays.append(pa.DictionaryArray.from_arrays(
+                store['arrays'][col], pa.array(np.asarray(store['categories'][col]).astype(str))))
+        else:
+            arrays.append(pa.array(store['arrays'][col])) # no nulls: a NaN stays a float value
+    for col, keys in store['keys'].items():
+        names.append('keys:' + col)
+        arrays.append(pa.array(keys))
+    table = pa.Table.from_arrays(arrays, names=names)
+    table = table.replace_schema_metadata({'budgetviz': json.dumps(meta), 'columns': json.dumps(store['columns'])})
+    with pa.OSFile(filename, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=max(len(table), 1))
+
+
+def _try_save_cache(store, path, meta):
+    try:
+        _save_cache(store, path, meta)
+    except OSError:
+        pass # a read-only data folder: we just parse the CSV every time
+
+
+def _map_npz(filename):
+    # np.savez stores the arrays uncompressed, so the data of each .npy member lies in the file as it is: skip the member's
+    # local zip header (30 bytes + the name + the extra field) and the .npy header, and map what follows
+    arrays = dict()
+    with zipfile.ZipFile(filename) as zf, open(filename, 'rb') as f:
+        for info in zf.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError('a compressed cache cannot be mapped: ' + info.filename)
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack('<HH', f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            if np.lib.format.read_magic(f) == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject:
+                raise ValueError('an object array cannot be mapped: ' + info.filename)
+            name = info.filename[:-len('.npy')]
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype) # mmap can't map zero bytes
+            else:
+                arrays[name] = np.memmap(filename, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                         order='F' if fortran_order else 'C')
+    return arrays
+
+
+def _read_cache(path):
+    read = _read_feather if cache_format() == 'feather' else _read_npz
+    return read(cache_path(path))
+
+
+def _read_npz(filename):
+    npz = _map_npz(filename)
+    meta = {key[5:]: npz[key].item() for key in npz if key.startswith('meta:')}
+    store = _new_store()
+    store['row_index'] = npz['__row__']
+    store['order'] = npz['__code_order__']
+    store['columns'] = [str(col) for col in npz['__columns__']]
+    for col in store['columns']:
+        if 'codes:' + col in npz:
+            store['arrays'][col] = npz['codes:' + col]
+            store['categories'][col] = pd.Index(np.asarray(npz['categories:' + col]), dtype=object)
+        else:
+            store['arrays'][col] = npz['values:' + col]
+    store['keys'] = {key[5:]: npz[key] for key in npz if key.startswith('keys:')}
+    return store, meta
+
+
+def _read_feather(filename):
+    # the file is mapped and read without copying: each column's buffer stays in the page cache, shared by the processes
+    # that have it open, and numpy gets a view of it (zero_copy_only refuses anything that would need a copy)
+    pa = _pyarrow()
+    table = pa.ipc.open_file(pa.memory_map(filename, 'r')).read_all()
+    metadata = table.schema.metadata or dict()
+    if table.num_rows and any(column.num_chunks != 1 for column in table.columns):
+        raise ValueError('a cache written in several batches cannot be mapped: ' + filename)
+
+    def array(name):
+        chunk = table.column(name).chunk(0) if table.num_rows else table.column(name).combine_chunks()
+        if isinstance(chunk, pa.DictionaryArray):
+            return chunk.indices.to_numpy(zero_copy_only=True), pd.Index(chunk.dictionary.to_pylist(), dtype=object)
+        return chunk.to_numpy(zero_copy_only=True), None
+
+    meta = json.loads(metadata[b'budgetviz'])
+    store = _new_store()
+    store['row_index'] = array('__row__')[0]
+    store['order'] = array('__code_order__')[0]
+    store['columns'] = json.loads(metadata[b'columns'])
+    for col in store['columns']:
+        store['arrays'][col], categories = array(col)
+        if categories is not None:
+            store['categories'][col] = categories
+    store['keys'] = {name[5:]: array(name)[0] for name in table.column_names if name.startswith('keys:')}
+    return store, meta
+
+
+def _cache_is_fresh(path, meta, stat):
+    # a cheap check first: the same size and modification time mean the same file; if only the mtime has changed (the file
+    # was copied or touched), the content hash decides
+    if meta.get('version') != CACHE_VERSION or meta.get('csv_size') != stat.st_size:
+        return False
+    if meta.get('csv_mtime') == stat.st_mtime_ns:
+        return True
+    return meta.get('csv_sha256') == file_hash(path)
+
+
+# THE STORE *******************************************************************************************************************
+
+
+# A store keeps the dataset column by column: an array per column (the codes for a categorical one, with its categories
+# aside), the row labels, and the code index's sort order and sorted codes. A dataframe is only put together when asked for:
+# building one from the mapped arrays would copy them all into the process.
+def _new_store():
+    return {'stamp': None, 'fingerprint': None, 'columns': [], 'arrays': dict(), 'categories': dict(), 'row_index': None,
+            'order': None, 'keys': dict(), 'index': None, 'frame': None}
+
+
+def _store_from_frame(df):
+    store = _new_store()
+    store['row_index'] = df.index.values
+    store['columns'] = list(df.columns)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            store['arrays'][col] = df[col].cat.codes.values
+            store['categories'][col] = df[col].cat.categories
+        else:
+            store['arrays'][col] = df[col].values
+    store['order'] = sort_order(store['arrays'])
+    store['index'] = CodeIndex(store['arrays'], order=store['order'])
+    store['keys'] = dict(zip(store['index'].columns, store['index'].keys))
+    return store
+
+
+def _column(store, col, rows=None, categorical=False):
+    values = store['arrays'][col] if rows is None else store['arrays'][col][rows]
+    if col in store['categories']:
+        values = pd.Categorical.from_codes(values, categories=store['categories'][col])
+        if not categorical:
+            values = np.asarray(values, dtype=object)
+    return values
+
+
+def _load_store(path, cache):
+    key = os.path.abspath(path)
+    stat = os.stat(path)
+    if key in _loaded and _loaded[key]['stamp'] == (stat.st_size, stat.st_mtime_ns):
+        return _loaded[key]
+
+    store, meta = None, dict()
+    if cache and os.path.exists(cache_path(path)):
+        try:
+            with stage('read_cache') as s:
+                store, meta = _read_cache(path)
+                s.rows_out = len(store['row_index'])
+        except (OSError, ValueError, KeyError):
+            store = None # an unreadable cache is simply rebuilt
+        else:
+            if not _cache_is_fresh(path, meta, stat):
+                store = None
+            elif meta['csv_mtime'] != stat.st_mtime_ns:
+                meta['csv_mtime'] = stat.st_mtime_ns
+                _try_save_cache(store, path, meta)
+
+    if store is None:
+        with stage('read_csv') as s:
+            store = _store_from_frame(_typed_frame(pd.read_csv(path, index_col=0)))
+            s.rows_out = len(store['row_index'])
+        meta = dict()
+        if cache:
+            with stage('write_cache'):
+                meta = {'version': CACHE_VERSION, 'csv_size': stat.st_size, 'csv_mtime': stat.st_mtime_ns,
+                        'csv_sha256': file_hash(path)}
+                _try_save_cache(store, path, meta)
+
+    store['stamp'] = (stat.st_size, stat.st_mtime_ns)
+    store['fingerprint'] = meta.get('csv_sha256')
+    _loaded[key] = store
+    return store
+
+
+# THE LOADER ******************************************************************************************************************
+
+
+# The whole dataset as a dataframe with categorical `index`/`region_eng`, int8 codes, int16 year and float64 value; all the
+# scripts in one process share it. By default the two name columns are handed out as plain strings: a pivot over a
+# categorical column orders (and keeps) its categories differently, and the scripts pick columns by position after their
+# pivots. Pass categorical=True to get the categorical columns as they are.
+def load_budget_data(path=DATA_PATH, cache=True, categorical=False):
+    store = _load_store(path, cache)
+    if store['frame'] is None:
+        store['frame'] = pd.DataFrame({col: _column(store, col, categorical=True) for col in store['columns']},
+                                      index=store['row_index'])
+    return _frame_view(store['frame'], categorical)
+
+
+# Only some rows (positions, e.g. from the code index) and columns of the dataset, taken straight from the store's arrays;
+# the charts' selections are made this way, so the whole dataframe is never built for them.
+def take_rows(rows, columns, path=DATA_PATH, cache=True, categorical=False):
+    store = _load_store(path, cache)
+    return pd.DataFrame({col: _column(store, col, rows, categorical) for col in columns}, index=store['row_index'][rows])
+
+
+# The classification code index of the same dataset; it is built once per store, and its row positions refer to the frames
+# returned by load_budget_data.
+def load_code_index(path=DATA_PATH, cache=True):
+    store = _load_store(path, cache)
+    if store['index'] is None:
+        store['index'] = CodeIndex(store['arrays'], order=store['order'], keys=store['keys'] or None)
+    return store['index']
+
+
+# The SHA-256 of the CSV the store was built from: anything derived from the data can be keyed on it. A CSV that is read
+# in chunks is hashed as it is on disk (once per version of the file), without building the store.
+def dataset_fingerprint(path=DATA_PATH, cache=True):
+    if streams(path, cache):
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if key not in _hashed:
+            _hashed[key] = file_hash(path)
+        return _hashed[key]
+    store = _load_store(path, cache)
+    if store['fingerprint'] is None:
+        store['fingerprint'] = file_hash(path)
+    return store['fingerprint']
+
+
+def _frame_view(df, categorical):
+    # a shallow copy: the columns share memory with the store, but adding or replacing a column doesn't touch it
+    df = df.copy(deep=False)
+    if not categorical:
+        for col in df.columns:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = np.asarray(df[col], dtype=object)
+    return df
+
+
+# THE STREAMING LOADER ********************************************************************************************************
+
+
+# Whether the selections from a CSV are read in chunks (scan_rows) rather than from its store: it's larger than STREAM_BYTES
+# and neither loaded in this process nor cached on disk. Set STREAM_BYTES to 0 to always read in chunks, or to None never to.
+def streams(path=DATA_PATH, cache=True):
+    if STREAM_BYTES is None or os.path.abspath(path) in _loaded or (cache and os.path.exists(cache_path(path))):
+        return False
+    return os.path.getsize(path) > STREAM_BYTES
+
+
+# The rows of a selection (the clauses of budgetviz.codes) read from the CSV chunk by chunk, like take_rows but without the
+# store: only the code columns the clauses test and the columns asked for are parsed, and each chunk is cut down to the
+# matching rows (and to the given years and regions) before the next one is read. The frame has the CSV's row labels and
+# the names as plain strings.
+def scan_rows(*clauses, columns=('year', 'index', 'region_eng', 'value'), years=None, regions=None, path=DATA_PATH,
+              chunksize=SCAN_CHUNK_ROWS, **predicates):
+    if predicates:
+        clauses = clauses + (predicates,)
+    columns = list(columns)
+    tested = sorted({code for clause in clauses for code, cond in clause.items() if cond is not None},
+                    key=CODE_COLUMNS.index)
+    filters = (['year'] if years is not None else []) + (['region_eng'] if regions is not None else [])
+    label = pd.read_csv(path, nrows=0).columns[0] # the row labels' column, which has no name
+    usecols = list(dict.fromkeys([label] + columns + tested + filters))
+    years = None if years is None else list(years)
+    regions = None if regions is None else list(regions)
+
+    parts = []
+    with stage('read_csv') as s, pd.read_csv(path, index_col=0, usecols=usecols, chunksize=chunksize) as reader:
+        scanned = 0
+        for chunk in reader:
+            scanned += len(chunk)
+            mask = match_rows(chunk, *clauses)
+            if years is not None:
+                mask &= chunk['year'].isin(years).values
+            if regions is not None:
+                mask &= chunk['region_eng'].isin(regions).values
+            parts.append(chunk.loc[mask, columns])
+        selected = pd.concat(parts) if parts else pd.DataFrame(columns=columns)
+        s.rows_in, s.rows_out = scanned, len(selected)
+    selected.index.name = None
+    return selected
@@ -0,0 +1,75 @@
+# Figures for the charts, with or without pyplot.
+
+# Run as a script, a chart is drawn on a pyplot figure, so plt.show() can open it in a window. A pipeline that renders many
+# charts in one process doesn't want that: pyplot keeps every figure it creates until it's closed, and a style set by one
+# chart (sns.set_style) stays for all the next ones. In the headless mode the charts are built on plain Figure objects with
+# an Agg canvas, which pyplot never sees; the rc settings are restored after each chart, and the figure is cleared and
+# dropped as soon as it's written, so memory stays flat however many charts are rendered. The charts' font is resolved and
+# loaded before the first of them (see budgetviz.fonts).
+
+import gc
+from contextlib import contextmanager
+
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from budgetviz.fonts import prewarm
+from budgetviz.stages import stage
+
+
+_headless = False
+_warm = False
+
+
+# The figure a chart is drawn on: the scripts call this instead of plt.figure()/plt.subplots(), with the same keywords
+# (figsize, facecolor...), and add their axes with fig.subplots() or fig.add_subplot().
+def new_figure(**kwargs):
+    if _headless:
+        fig = Figure(**kwargs)
+        FigureCanvasAgg(fig) # attaches itself to the figure
+        return fig
+    import matplotlib.pyplot as plt
+    return plt.figure(**kwargs)
+
+
+@contextmanager
+def headless():
+    global _headless, _warm
+    if not _warm:
+        prewarm()
+        _warm = True
+    previous = _headless
+    _headless = True
+    try:
+        with matplotlib.rc_context(): # whatever rc the chart changes is undone on the way out
+            yield
+    finally:
+        _headless = previous
+
+
+def close_figure(fig):
+    if fig.canvas.manager is not None: # a pyplot figure
+        import matplotlib.pyplot as plt
+        plt.close(fig)
+    fig.clear() # drops the axes and their artists; the figure and canvas refer to each other, so they are collected below
+
+
+# Builds the chart from its data without pyplot, saves it and releases the figure; returns the file name. The image is
+# written by fig.savefig, or by save(fig, filename, **savefig_kwargs) if given (e.g. budgetviz.output.save_figure).
+#   render(build_chart, prepare_data(), OUTPUT, dpi=300, bbox_inches='tight')
+def render(build_chart, data, filename, save=None, **savefig_kwargs):
+    with headless():
+        with stage('build_chart'):
+            fig = build_chart(data)
+        try:
+            with stage('savefig'):
+                if save is None:
+                    fig.savefig(filename, **savefig_kwargs)
+                else:
+                    save(fig, filename, **savefig_kwargs)
+        finally:
+            close_figure(fig)
+            del fig
+            gc.collect()
+    return filename
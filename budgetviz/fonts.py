@@ -0,0 +1,130 @@
+# Fonts of the charts, and the work done with them kept between charts and runs.
+
+# The charts are set in Calibri. Where it isn't installed (on Linux, mostly), asking matplotlib for it by name on every
+# label means a search through the whole font list that fails, a warning, and the fallback font in the end. Instead the
+# family is resolved once per process, to the first installed family of a fallback chain (FONT_FAMILIES, or the
+# BUDGETVIZ_FONTS environment variable, e.g. "Calibri,Carlito"), which ends with DejaVu Sans, the font matplotlib ships
+# with. A chart calls use_chart_font() before it adds any text (after sns.set_style, which resets the fonts), and all its
+# text is set in that family through rcParams, with no font keywords on the labels. prewarm() resolves the family and loads
+# its regular and bold faces before the first chart, so no chart pays for it.
+#
+# A PDF with TrueType fonts embedded (pdf.fonttype 42, as budgetviz.output exports) carries a subset of each font: only the
+# glyphs the chart uses, cut out of the font file by fontTools every time a PDF is written. While glyph_subsets() is open,
+# the subsets are kept in FONT_CACHE_DIR, one file per (font file, characters), and the next PDF with the same text reuses
+# them.
+
+import hashlib
+import io
+import os
+import threading
+from contextlib import contextmanager
+
+
+FONT_CACHE_DIR = '.font_cache'
+
+FONT_FAMILIES = ('Calibri', 'Carlito', 'DejaVu Sans') # Carlito has Calibri's metrics; DejaVu Sans comes with matplotlib
+
+FALLBACK_FAMILY = 'DejaVu Sans'
+
+_family = None # the family of the charts, once resolved
+
+_subset_lock = threading.Lock()
+_subset_users = 0 # the glyph_subsets() contexts open, in all the threads
+_get_glyphs_subset = None # matplotlib's, while the cache stands in for it
+
+
+# THE FAMILY ******************************************************************************************************************
+
+
+def font_families():
+    families = os.environ.get('BUDGETVIZ_FONTS')
+    if families:
+        return tuple(family.strip() for family in families.split(',') if family.strip()) + (FALLBACK_FAMILY,)
+    return FONT_FAMILIES
+
+
+# The first family of the chain that is installed, looked up in the font list matplotlib keeps (no failed lookups, so no
+# warnings); resolved once per process.
+def font_family():
+    global _family
+    if _family is None:
+        from matplotlib import font_manager
+        installed = {font.name for font in font_manager.fontManager.ttflist}
+        _family = next((family for family in font_families() if family in installed), FALLBACK_FAMILY)
+    return _family
+
+
+# The rc settings that set every text of a chart in the family.
+def chart_font_rc():
+    return {'font.family': [font_family()]}
+
+
+# Sets the chart's text in the family: the rest of the chart's text takes it from rcParams. In the headless mode (see
+# budgetviz.figures) the settings are undone after the chart.
+def use_chart_font():
+    import matplotlib
+    matplotlib.rcParams.update(chart_font_rc())
+
+
+# Resolves the family and finds and loads its regular and bold faces, so the first chart's text doesn't wait for them.
+def prewarm():
+    from matplotlib import font_manager
+    for weight in ('normal', 'bold'):
+        font_manager.get_font(font_manager.findfont(font_manager.FontProperties(family=font_family(), weight=weight)))
+
+
+# THE SUBSETS *****************************************************************************************************************
+
+
+def _subset_file(fontfile, characters):
+    stat = os.stat(fontfile)
+    key = repr((os.path.abspath(fontfile), stat.st_size, stat.st_mtime_ns, ''.join(sorted(set(characters)))))
+    return os.path.join(FONT_CACHE_DIR, 'subsets', hashlib.sha1(key.encode()).hexdigest() + '.ttf')
+
+
+def _cached_subset(fontfile, characters):
+    filename = _subset_file(fontfile, characters)
+    try:
+        with open(filename, 'rb') as f:
+            return io.BytesIO(f.read())
+    except OSError:
+        pass
+    data = _get_glyphs_subset(fontfile, characters)
+    try:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename + '.tmp', 'wb') as f:
+            f.write(data.getvalue())
+        os.replace(filename + '.tmp', filename)
+    except OSError:
+        pass
+    data.seek(0)
+    return data
+
+
+# While it's open, the PDF (and PS) backend's font subsets come from the cache or are made once and kept. The backend's
+# get_glyphs_subset is private (see the pin in requirements.txt); a matplotlib without it saves as it would anyway, with
+# no cache. The function is replaced for the whole process, so a PDF saved meanwhile in another thread goes through the
+# cache too (and gets the same subsets). The contexts open in all the threads are counted, and matplotlib's function is
+# put back when the last one closes.
+@contextmanager
+def glyph_subsets():
+    global _get_glyphs_subset, _subset_users
+    try:
+        from matplotlib.backends import _backend_pdf_ps
+    except ImportError:
+        _backend_pdf_ps = None
+    if not hasattr(_backend_pdf_ps, 'get_glyphs_subset'):
+        yield
+        return
+    with _subset_lock:
+        if not _subset_users:
+            _get_glyphs_subset = _backend_pdf_ps.get_glyphs_subset
+            _backend_pdf_ps.get_glyphs_subset = _cached_subset
+        _subset_users += 1
+    try:
+        yield
+    finally:
+        with _subset_lock:
+            _subset_users -= 1
+            if not _subset_users:
+                _backend_pdf_ps.get_glyphs_subset = _get_glyphs_subset
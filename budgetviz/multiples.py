@@ -0,0 +1,79 @@
+# Small multiples: a grid of panels of the same kind, one per item (a region, a tax...).
+
+# The grid is allocated once: one figure, one gridspec and exactly one axes per cell. With share=True (the default) every
+# panel shares its x and y axes with the first one (sharex/sharey): the panels use the first one's tick locators and
+# formatters, so a formatter is set once (see shared_axes) instead of being built for each panel, and they keep the same
+# limits (see set_limits).
+# The panels are drawn by a function of (ax, item). More items than cells are drawn in batches: after a batch is saved, the
+# same axes are cleared of its artists and reused for the next one, so the cost of making the axes is paid once however many
+# panels there are.
+
+import math
+
+from budgetviz.figures import new_figure
+
+
+class SmallMultiples:
+
+    def __init__(self, nrows, ncols, panel_size=(4, 4), share=True, **figure_kwargs):
+        figure_kwargs.setdefault('figsize', (ncols * panel_size[0], nrows * panel_size[1]))
+        self.fig = new_figure(**figure_kwargs)
+        self.share = share
+        self.axes = [] # row by row
+        spec = self.fig.add_gridspec(nrows, ncols)
+        for n in range(nrows):
+            for m in range(ncols):
+                first = self.axes[0] if share and self.axes else None
+                self.axes.append(self.fig.add_subplot(spec[n, m], sharex=first, sharey=first))
+
+    def __len__(self):
+        return len(self.axes)
+
+    # The axes to set the tick locators and formatters (and the limits) of all the panels on: with share=True that's the
+    # first panel only (the others share its axes), otherwise every panel.
+    def shared_axes(self):
+        return self.axes[:1] if self.share else self.axes
+
+    # The same limits for every panel; a None leaves the axis as it is.
+    def set_limits(self, xlim=None, ylim=None):
+        for ax in self.shared_axes():
+            if xlim is not None:
+                ax.set_xlim(*xlim)
+            if ylim is not None:
+                ax.set_ylim(*ylim)
+
+    # Draws one panel per item, in the grid order; the cells left without an item are hidden. Returns the figure.
+    def draw(self, draw_panel, items):
+        items = list(items)
+        if len(items) > len(self.axes):
+            raise ValueError('%d panels for a grid of %d; use batches()' % (len(items), len(self.axes)))
+        for ax, item in zip(self.axes, items):
+            ax.set_visible(True)
+            draw_panel(ax, item)
+        for ax in self.axes[len(items):]:
+            ax.set_visible(False)
+        return self.fig
+
+    # Draws the items a grid at a time and yields the figure after each batch; it has to be saved before the next batch is
+    # drawn, e.g.
+    #   for page, fig in enumerate(grid.batches(draw_panel, regions)):
+    #       fig.savefig('regions_%d.png' % page)
+    def batches(self, draw_panel, items):
+        items = list(items)
+        for start in range(0, len(items), len(self.axes)):
+            if start:
+                self.clear()
+            yield self.draw(draw_panel, items[start:start + len(self.axes)])
+
+    # Removes what the panels have drawn (lines, areas, patches, texts, titles), keeping the axes, their ticks and styling.
+    def clear(self):
+        for ax in self.axes:
+            for artist in list(ax.lines) + list(ax.collections) + list(ax.patches) + list(ax.texts) + list(ax.images):
+                artist.remove()
+            for loc in ('left', 'center', 'right'):
+                ax.set_title('', loc=loc)
+
+
+# A grid with room for n_panels: ncols panels per row and as many rows as needed.
+def small_multiples(n_panels, ncols=5, **kwargs):
+    return SmallMultiples(max(1, math.ceil(n_panels / ncols)), ncols, **kwargs)
@@ -0,0 +1,294 @@
+# Saving the charts' images: one draw, the tight bbox from a cache, and the encoder chosen by the caller.
+
+# savefig(dpi=300, bbox_inches='tight') draws a figure twice. The first pass only lays it out to find the tight bbox, and
+# the second draws it into that box. The pixels then go to a PNG encoder with the default settings. save_figure() does the
+# same with less work. The tight bbox of a chart's layout is kept in a folder (one small JSON file per layout), so the
+# next save of the same layout skips the first pass. A layout is the chart, its data and its code, as the caller names it,
+# plus the figure's size, the DPI, the padding and the rc settings of the text (its fonts and sizes). The figure is drawn
+# once on the Agg canvas, into the box as savefig would draw it, and the canvas buffer goes straight to Pillow. A PNG's
+# zlib compression level can be chosen (1 is fast, 9 is small), and WebP or JPEG can be written instead. Other DPIs (a
+# preview, a thumbnail) are resampled from the same pixels instead of drawn again. The pixels of a PNG at the drawn DPI
+# are those savefig writes.
+# export_figure writes a chart in several formats at once, e.g. a PNG for the web and a PDF and an SVG for print. The tight
+# bbox is found once (the layout pass savefig would repeat per format), and every format is written into that same box.
+# Each format is still drawn in full by its own backend: the PNG by save_figure, the PDF and the SVG by savefig. The PDF
+# embeds its fonts as TrueType subsets, which are cached across charts and runs (see budgetviz.fonts). The time each
+# format takes is reported.
+#
+# Run from the root of the repo:  python -m budgetviz.output [chart names...] [-f png pdf svg] [-o OUTPUT_DIR] [--dpi DPI]
+# e.g. python -m budgetviz.output 01 08 -f png pdf
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+
+from budgetviz.fonts import font_family, glyph_subsets
+from budgetviz.stages import stage
+
+
+BBOX_CACHE_DIR = '.bbox_cache'
+
+PNG_COMPRESS_LEVEL = 6 # zlib's and Pillow's default; 1 encodes several times faster into a larger file
+QUALITY = 90 # for WebP and JPEG
+
+FORMATS = {'png': 'PNG', 'webp': 'WEBP', 'jpg': 'JPEG', 'jpeg': 'JPEG'}
+
+# the rc settings of the text (families, sizes, weights, the TeX and mathtext fonts) that go into a cached box's key
+TEXT_RC_PREFIXES = ('font.', 'text.', 'mathtext.')
+
+VECTOR_FORMATS = ('pdf', 'svg')
+
+EXPORT_FORMATS = ('png', 'pdf', 'svg')
+
+# the fonts of a PDF are embedded as TrueType subsets (cut by fontTools, and cached) rather than converted to Type 3 glyph
+# procedures; the text stays text, and can be selected and searched
+VECTOR_RC = {'pdf.fonttype': 42}
+
+
+# THE TIGHT BBOX **************************************************************************************************************
+
+
+# The tight bbox of a figure, in inches, as savefig(bbox_inches='tight') finds it: a layout pass with the drawing turned
+# off (text is measured, nothing is rasterized), at the figure's DPI. The renderer's _draw_disabled is private (checked
+# against matplotlib 3.6 and 3.7, the range requirements.txt pins); without it the figure is drawn in full.
+def tight_bbox(fig, pad_inches=None):
+    from matplotlib import rcParams
+    pad_inches = rcParams['savefig.pad_inches'] if pad_inches is None else pad_inches
+    renderer = fig.canvas.get_renderer()
+    if hasattr(renderer, '_draw_disabled'):
+        with renderer._draw_disabled():
+            fig.draw(renderer)
+    else:
+        fig.canvas.draw()
+        renderer = fig.canvas.get_renderer()
+    return fig.get_tightbbox(renderer).padded(pad_inches)
+
+
+# matplotlib's adjust_bbox, which cuts the canvas to a bbox as savefig does and returns a function that undoes it. It is
+# private (matplotlib._tight_bbox, checked against matplotlib 3.6 and 3.7, as pinned); None where a matplotlib lacks it.
+def _adjust_bbox():
+    try:
+        from matplotlib._tight_bbox import adjust_bbox
+    except ImportError:
+        return None
+    return adjust_bbox
+
+
+class BBoxCache:
+
+    def __init__(self, directory=BBOX_CACHE_DIR):
+        self.directory = directory # None keeps the boxes in memory only
+        self.boxes = dict()
+        self.hits = self.misses = 0
+
+    # The text's fonts and sizes move the tight bbox as much as the layout does, so their rc settings are part of the key,
+    # with the family the charts resolve to (see budgetviz.fonts: it changes with the installed fonts and BUDGETVIZ_FONTS).
+    @staticmethod
+    def key(layout, fig, dpi, pad_inches):
+        from matplotlib import rcParams
+        width, height = fig.get_size_inches()
+        pad_inches = rcParams['savefig.pad_inches'] if pad_inches is None else pad_inches
+        text_rc = sorted((name, repr(value)) for name, value in rcParams.items() if name.startswith(TEXT_RC_PREFIXES))
+        key = (layout, round(width, 6), round(height, 6), dpi, pad_inches, font_family(), text_rc)
+        return hashlib.sha1(repr(key).encode()).hexdigest()
+
+    # The box of the layout, computed (and kept) if it isn't known yet. The figure's DPI must be the one it's saved at.
+    def bbox(self, layout, fig, pad_inches=None):
+        from matplotlib.transforms import Bbox
+        key = self.key(layout, fig, fig.dpi, pad_inches)
+        if key not in self.boxes:
+            self.boxes[key] = self._read(key)
+        if self.boxes[key] is not None:
+            self.hits += 1
+            return Bbox(self.boxes[key])
+        self.misses += 1
+        bbox = tight_bbox(fig, pad_inches)
+        self.boxes[key] = bbox.get_points().tolist()
+        self._write(key, self.boxes[key])
+        return bbox
+
+    def _read(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(os.path.join(self.directory, key + '.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, key, points):
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            filename = os.path.join(self.directory, key + '.json')
+            with open(filename + '.tmp', 'w') as f:
+                json.dump(points, f)
+            os.replace(filename + '.tmp', filename) # the workers of budgetviz.render may write the same box at once
+        except OSError:
+            pass # a read-only folder: the box is kept in memory
+
+
+_default_cache = BBoxCache()
+
+
+# THE ENCODERS ****************************************************************************************************************
+
+
+def image_format(filename, format=None):
+    format = (format or os.path.splitext(filename)[1][1:] or 'png').lower()
+    if format not in FORMATS:
+        raise ValueError('save_figure writes %s, not %s' % (', '.join(sorted(FORMATS)), format))
+    return format
+
+
+# Writes an RGBA image (a Pillow Image) in the format: PNG at the compression level, WebP or JPEG at the quality.
+def encode(image, filename, format='png', dpi=None, compress_level=PNG_COMPRESS_LEVEL, quality=QUALITY):
+    kwargs = {'dpi': (dpi, dpi)} if dpi else dict()
+    if format == 'png':
+        kwargs['compress_level'] = compress_level
+    else:
+        kwargs['quality'] = quality
+    if FORMATS[format] == 'JPEG':
+        image = image.convert('RGB') # no alpha in a JPEG
+    image.save(filename, format=FORMATS[format], **kwargs)
+    return filename
+
+
+# The name of the image at another DPI: chart.png -> chart@150.png.
+def dpi_path(filename, dpi):
+    root, ext = os.path.splitext(filename)
+    return '%s@%d%s' % (root, dpi, ext)
+
+
+# THE SAVE ********************************************************************************************************************
+
+
+# Saves the figure into its tight bbox at dpi, in one draw, like fig.savefig(filename, dpi=dpi, bbox_inches='tight').
+# The format comes from the extension (or format): png, webp or jpg. layout names the chart's layout for the bbox cache,
+# e.g. the chart and the fingerprints of its data and code. Without it the box is computed every time, but the figure is
+# still drawn once. dpis are the other DPIs to write, resampled from the pixels drawn at dpi (which should be the
+# largest), into the files named by dpi_path. A bbox (in inches) can be given instead, as export_figure does. Returns the
+# file names.
+def save_figure(fig, filename, dpi=300, format=None, layout=None, dpis=(), pad_inches=None,
+                compress_level=PNG_COMPRESS_LEVEL, quality=QUALITY, cache=None, bbox=None):
+    from PIL import Image
+    adjust_bbox = _adjust_bbox()
+    format = image_format(filename, format)
+    original_dpi = fig.dpi
+    fig.dpi = dpi
+    try:
+        if bbox is None:
+            with stage('tight_bbox'):
+                bbox = _figure_bbox(fig, layout, pad_inches, cache)
+        if adjust_bbox is None:
+            with stage('draw'):
+                image = _savefig_image(fig, dpi, bbox)
+        else:
+            restore = adjust_bbox(fig, bbox, fig.canvas.fixed_dpi)
+            try:
+                with stage('draw'):
+                    fig.canvas.draw()
+                image = Image.frombuffer('RGBA', fig.canvas.get_width_height(), fig.canvas.buffer_rgba(), 'raw', 'RGBA',
+                                         0, 1)
+                image = image.copy() # the canvas is released with the figure
+            finally:
+                restore()
+    finally:
+        fig.dpi = original_dpi
+
+    with stage('encode'):
+        filenames = [encode(image, filename, format, dpi, compress_level, quality)]
+        for other in dpis:
+            size = (max(1, round(image.width * other / dpi)), max(1, round(image.height * other / dpi)))
+            filenames.append(encode(image.resize(size, Image.LANCZOS), dpi_path(filename, other), format, other,
+                                    compress_level, quality))
+    return filenames
+
+
+# The figure as plain savefig draws it, for a matplotlib without adjust_bbox: a PNG in memory, read back by Pillow.
+def _savefig_image(fig, dpi, bbox):
+    from PIL import Image
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi, bbox_inches=bbox)
+    buffer.seek(0)
+    return Image.open(buffer).convert('RGBA')
+
+
+def _figure_bbox(fig, layout, pad_inches, cache):
+    cache = _default_cache if cache is None else cache
+    return cache.bbox(layout, fig, pad_inches) if layout is not None else tight_bbox(fig, pad_inches)
+
+
+# THE EXPORT ******************************************************************************************************************
+
+
+# Writes the figure in every format of formats (png, webp or jpg, pdf, svg) into root.<format>, all cut to the same tight
+# bbox, found once at dpi (or taken from the cache for layout). The raster formats are drawn at dpi as save_figure draws
+# them; the vector ones keep dpi for their images only. Returns (format, file name, seconds) per format, after
+# ('layout', None, seconds) for the bbox.
+def export_figure(fig, root, formats=EXPORT_FORMATS, dpi=300, layout=None, pad_inches=None, cache=None, **raster_kwargs):
+    import matplotlib
+    start = time.perf_counter()
+    original_dpi = fig.dpi
+    fig.dpi = dpi
+    try:
+        with stage('tight_bbox'):
+            bbox = _figure_bbox(fig, layout, pad_inches, cache)
+    finally:
+        fig.dpi = original_dpi
+    times = [('layout', None, time.perf_counter() - start)]
+
+    for format in formats:
+        start = time.perf_counter()
+        filename = '%s.%s' % (root, format)
+        with stage('export ' + format):
+            if format in VECTOR_FORMATS:
+                with matplotlib.rc_context(VECTOR_RC), glyph_subsets():
+                    fig.savefig(filename, format=format, dpi=dpi, bbox_inches=bbox)
+            else:
+                save_figure(fig, filename, dpi, format, bbox=bbox, **raster_kwargs)
+        times.append((format, filename, time.perf_counter() - start))
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export the charts in several formats from one layout.')
+    parser.add_argument('charts', nargs='*', help='the charts to export (a name or its beginning, e.g. 02); all by default')
+    parser.add_argument('-f', '--formats', nargs='+', default=list(EXPORT_FORMATS), help='png, webp, jpg, pdf or svg')
+    parser.add_argument('-o', '--output-dir', default=None, help='the folder for the files (the current one by default)')
+    parser.add_argument('--dpi', type=int, default=300)
+    args = parser.parse_args(argv)
+
+    import matplotlib
+    matplotlib.use('Agg')
+    from budgetviz.figures import close_figure, headless
+    from budgetviz.render import layout_key, load_chart, select_charts
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    start = time.perf_counter()
+    print('%-50s %-8s %9s %10s' % ('chart', 'format', 'time, s', 'size, kB'))
+    for name in select_charts(args.charts):
+        module = load_chart(name)
+        data = module.prepare_data()
+        root = os.path.join(args.output_dir or '.', os.path.splitext(module.OUTPUT)[0])
+        with headless():
+            fig = module.build_chart(data)
+            try:
+                times = export_figure(fig, root, args.formats, args.dpi, layout=layout_key(name))
+            finally:
+                close_figure(fig)
+        for format, filename, seconds in times:
+            size = '%10.0f' % (os.path.getsize(filename) / 1024) if filename else ''
+            print('%-50s %-8s %9.2f %s' % (name, format, seconds, size))
+    print('%-50s %-8s %9.2f' % ('total', '', time.perf_counter() - start))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
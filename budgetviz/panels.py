@@ -0,0 +1,38 @@
+# Data for small multiples: one 3-D array instead of lists of lists.
+
+# A grid of charts such as chart 02 draws, for each panel (a region), several series (the taxes) over the same x (the
+# years). Here the values are kept in a single contiguous float array of shape (panel, series, x), with the labels of each
+# axis alongside; it is filled from a pivot table with one reshape, and a panel's values, panel_data[i], are a view of it
+# (series x x), ready for stackplot or plot without going through Python lists.
+
+import numpy as np
+import pandas as pd
+
+
+class PanelData:
+
+    def __init__(self, values, panels, series, x):
+        self.values = values
+        self.panels = np.asarray(panels)
+        self.series = np.asarray(series)
+        self.x = np.asarray(x)
+
+    def __len__(self):
+        return len(self.panels)
+
+    def __getitem__(self, i):
+        return self.values[i]
+
+    # From a table indexed by (panel, series) with the x values as columns, e.g. the pivot of chart 02:
+    #   PanelData.from_pivot(table.pivot(index=['region_eng', 'tax_type'], columns='year', values='amount'))
+    # The panels and the series keep their order of appearance in the index. A series a panel doesn't have is NaN.
+    @classmethod
+    def from_pivot(cls, table):
+        panels = table.index.get_level_values(0).unique()
+        series = table.index.get_level_values(1).unique()
+        full = pd.MultiIndex.from_product([panels, series], names=table.index.names)
+        if not table.index.equals(full):
+            table = table.reindex(full)
+        # a frame's values are usually laid out column by column; one copy makes them row-major, so the reshape is a view
+        values = np.ascontiguousarray(table.to_numpy(dtype='float64'))
+        return cls(values.reshape(len(panels), len(series), table.shape[1]), panels, series, table.columns)
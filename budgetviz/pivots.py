@@ -0,0 +1,184 @@
+# Cached selections and pivots of the budget dataset.
+
+# Almost every chart starts the same way: select rows by classification codes, keep year/index/region_eng/value, and pivot
+# the budget items into columns (charts 04, 05 and 08 build nearly the same regional_flows/cum_flow frame). Here that step
+# is done once per (dataset, filter, pivot) and the result is reused: from memory while it fits into the byte budget, and
+# from a folder on disk across runs and processes.
+
+import hashlib
+import os
+import shutil
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import pandas as pd
+
+from budgetviz.codes import denormalize, normalize
+from budgetviz.data import DATA_PATH, dataset_fingerprint, load_code_index, scan_rows, streams, take_rows
+from budgetviz.stages import stage, staged
+
+
+CACHE_DIR = '.pivot_cache'
+
+
+class PivotCache:
+
+    def __init__(self, max_bytes=256 * 1024**2, directory=CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.directory = directory # None keeps everything in memory only
+        self.frames = OrderedDict() # key -> frame, the least recently used first
+        self.sizes = dict() # key -> the frame's size in bytes
+        self.nbytes = 0
+        self.hits = self.disk_hits = self.misses = 0
+
+    # The frame for a selection and a pivot spec; see budget_pivot below for the arguments. The caller gets its own copy, so
+    # adding columns to it (as the scripts do) never changes the cached frame.
+    def pivot(self, path, clauses, index, columns, values, fill_value, years, regions):
+        fingerprint = dataset_fingerprint(path)
+        spec = (tuple(index) if isinstance(index, (list, tuple)) else index, columns, values, fill_value,
+                None if years is None else tuple(sorted(set(years))),
+                None if regions is None else tuple(sorted(set(regions))))
+        key = (fingerprint, normalize(clauses), spec)
+
+        if key in self.frames:
+            self.frames.move_to_end(key)
+            self.hits += 1
+            return self.frames[key].copy()
+
+        table = self._read(path, key)
+        if table is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            table = _select_and_pivot(path, clauses, *spec)
+            self._write(path, key, table)
+        self._remember(key, table)
+        return table.copy()
+
+    def clear(self):
+        self.frames.clear()
+        self.sizes.clear()
+        self.nbytes = 0
+        if self.directory and os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+
+    def _remember(self, key, table):
+        size = table.memory_usage(index=True, deep=True).sum()
+        if size > self.max_bytes:
+            return # bigger than the whole budget: it stays on disk only
+        self.frames[key] = table
+        self.sizes[key] = size
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            evicted, _ = self.frames.popitem(last=False) # it's already on disk, so evicting just drops it
+            self.nbytes -= self.sizes.pop(evicted)
+
+    # On disk, each dataset version gets its own folder (<csv name>-<fingerprint>); the folders of the older versions of the
+    # same CSV are removed when a new one appears, as nothing can hit them any more.
+    def _folder(self, path, fingerprint):
+        name = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.directory, '%s-%s' % (name, fingerprint[:16]))
+
+    def _file(self, path, key):
+        digest = hashlib.sha1(repr(key[1:]).encode()).hexdigest()
+        return os.path.join(self._folder(path, key[0]), digest + '.pkl')
+
+    def _read(self, path, key):
+        if not self.directory:
+            return None
+        try:
+            return pd.read_pickle(self._file(path, key))
+        except (OSError, EOFError, ValueError):
+            return None
+
+    def _write(self, path, key, table):
+        if not self.directory:
+            return
+        folder = self._folder(path, key[0])
+        try:
+            if not os.path.isdir(folder):
+                prefix = os.path.basename(folder).rsplit('-', 1)[0] + '-'
+                if os.path.isdir(self.directory):
+                    for old in os.listdir(self.directory):
+                        if old.startswith(prefix):
+                            shutil.rmtree(os.path.join(self.directory, old), ignore_errors=True)
+                os.makedirs(folder)
+            tmp = self._file(path, key) + '.tmp'
+            table.to_pickle(tmp)
+            os.replace(tmp, self._file(path, key))
+        except OSError:
+            pass # no room on disk or a read-only folder: the result is still kept in memory
+
+
+@staged('query')
+def _select(path, clauses, keep, years, regions):
+    # only the selected rows and the columns kept are taken from the store (see budgetviz.data.take_rows), with the names as
+    # plain strings (see load_budget_data); a CSV too large for a store is read in chunks, with the codes, years and regions
+    # filtered as it's read (see budgetviz.data.scan_rows)
+    if streams(path):
+        return scan_rows(*clauses, columns=keep, years=years, regions=regions, path=path)
+    filters = (['year'] if years is not None else []) + (['region_eng'] if regions is not None else [])
+    selected = take_rows(load_code_index(path).rows(*clauses), list(dict.fromkeys(keep + filters)), path)
+    if years is not None:
+        selected = selected[selected['year'].isin(years)]
+    if regions is not None:
+        selected = selected[selected['region_eng'].isin(regions)]
+    return selected[keep]
+
+
+def _select_and_pivot(path, clauses, index, columns, values, fill_value, years, regions):
+    index = list(index) if isinstance(index, tuple) else index
+    keep = list(dict.fromkeys((index if isinstance(index, list) else [index]) + [columns, values]))
+    selected = _select(path, clauses, keep, years, regions)
+    with stage('pivot', rows_in=len(selected)) as s:
+        table = selected.pivot(index=index, columns=columns, values=values)
+        if fill_value is not None:
+            table = table.fillna(fill_value)
+        s.rows_out = len(table)
+    return table
+
+
+_default_cache = PivotCache()
+
+_recorders = [] # the lists that record_selections() is filling
+
+
+# Select the rows by classification codes (the clauses of budgetviz.codes: dicts OR-ed together, or keyword codes for a
+# single clause), optionally keep only some years and regions, and pivot them:
+#   budget_pivot(dict(i1=1, r1=ne(0), r3=0), dict(i1=1, i3=9), fill_value=0)
+# is the same frame as
+#   df.query('(i1 == 1 & r1 != 0 & r3 == 0) | (i1 == 1 & i3 == 9)')[['year', 'index', 'region_eng', 'value']].pivot(
+#       index=['year', 'region_eng'], columns='index', values='value').fillna(0)
+@staged('budget_pivot')
+def budget_pivot(*clauses, path=DATA_PATH, index=('year', 'region_eng'), columns='index', values='value', fill_value=None,
+                 years=None, regions=None, cache=None, **predicates):
+    if predicates:
+        clauses = clauses + (predicates,)
+    for selections in _recorders:
+        selections.append((normalize(clauses), None if years is None else tuple(sorted(set(years))),
+                           None if regions is None else tuple(sorted(set(regions)))))
+    cache = _default_cache if cache is None else cache
+    return cache.pivot(path, clauses, index, columns, values, fill_value, years, regions)
+
+
+# Collects the selections made by budget_pivot while it's open, as (normalized clauses, years, regions), with years and
+# regions as sorted tuples or None; a chart's list tells exactly which slice of the dataset it reads (see budgetviz.build).
+#   with record_selections() as selections:
+#       data = prepare_data()
+@contextmanager
+def record_selections():
+    selections = []
+    _recorders.append(selections)
+    try:
+        yield selections
+    finally:
+        _recorders.remove(selections)
+
+
+# A digest of the rows a selection (as recorded above) takes: their year, item, region and value, in a fixed order, so
+# neither the rows' place in the CSV nor the rows the selection doesn't take change it.
+def selection_fingerprint(selection, path=DATA_PATH):
+    clauses, years, regions = selection
+    selected = _select(path, denormalize(clauses), ['year', 'index', 'region_eng', 'value'], years, regions)
+    selected = selected.astype({'year': 'int64'}).sort_values(['year', 'index', 'region_eng', 'value'], ignore_index=True)
+    return hashlib.sha1(pd.util.hash_pandas_object(selected, index=False).values.tobytes()).hexdigest()
@@ -0,0 +1,226 @@
+# Drawing routines shared by the charts.
+
+import numpy as np
+import pandas as pd
+
+from matplotlib import rcParams
+from matplotlib.artist import Artist, allow_rasterization
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.text import Text
+from matplotlib.transforms import Bbox
+
+
+# A stacked area chart with a line along the top edge of every layer, in the layer's color (chart 02). The layers are the
+# rows of `values` (series x x, e.g. a panel of budgetviz.panels.PanelData), stacked from the bottom up in that order; their
+# edges are the running totals of the same array, one np.cumsum along the series, so no second table is needed for them.
+# The edges are drawn from the top one down, above the areas; decimals rounds them (the areas are left as they are).
+# Returns the areas (PolyCollections) and the edge lines.
+def stacked_area(ax, x, values, colors, labels=None, linewidth=3, decimals=None, alpha=0.9, zorder=2):
+    kwargs = dict() if labels is None else {'labels': labels}
+    areas = ax.stackplot(x, values, colors=colors, edgecolor=None, alpha=alpha, zorder=zorder, **kwargs)
+    edges = np.cumsum(values, axis=0)
+    if decimals is not None:
+        edges = edges.round(decimals)
+    lines = []
+    for edge, color in zip(edges[::-1], colors[::-1]):
+        lines += ax.plot(x, edge, color=color, linewidth=linewidth, zorder=zorder + 1)
+    return areas, lines
+
+
+# Box statistics of many groups at once, as matplotlib's boxplot computes them for one: the quartiles by linear
+# interpolation, the whiskers at the most extreme values within whis * IQR of the box (never inside the box), and the
+# fliers beyond them. `groups` is the group number (0..n_groups-1) of each value, -1 to leave the value out; NaN values are
+# left out too. The values are sorted once by (group, value), so every quantile of every group is a single array lookup.
+# Returns a dict of arrays, one item per group: q1, med, q3, whislo, whishi, count (an empty group is NaN), plus flier, a
+# mask over the values.
+def box_stats(groups, values, n_groups, whis=1.5):
+    groups = np.asarray(groups, dtype='int64')
+    values = np.asarray(values, dtype='float64')
+    keep = (groups >= 0) & ~np.isnan(values)
+    g, v = groups[keep], values[keep]
+    order = np.lexsort((v, g))
+    g, v = g[order], v[order]
+    count = np.bincount(g, minlength=n_groups)
+    start = np.cumsum(count) - count
+    filled = count > 0
+
+    def quantile(q):
+        out = np.full(n_groups, np.nan)
+        pos = start[filled] + q * (count[filled] - 1)
+        lo = np.floor(pos).astype('int64')
+        hi = np.minimum(lo + 1, start[filled] + count[filled] - 1)
+        out[filled] = v[lo] + (v[hi] - v[lo]) * (pos - lo)
+        return out
+
+    q1, med, q3 = quantile(0.25), quantile(0.5), quantile(0.75)
+    iqr = q3 - q1
+    inside = (v >= (q1 - whis * iqr)[g]) & (v <= (q3 + whis * iqr)[g])
+    whislo, whishi = q1.copy(), q3.copy()
+    np.minimum.at(whislo, g[inside], v[inside])
+    np.maximum.at(whishi, g[inside], v[inside])
+
+    flier = np.zeros(len(values), dtype=bool)
+    flier[np.flatnonzero(keep)[order]] = ~inside
+    return dict(q1=q1, med=med, q3=q3, whislo=whislo, whishi=whishi, count=count, flier=flier)
+
+
+# A grouped boxplot of data[y] (chart 05): the x categories (`order`) at 0, 1, 2..., with a box for every hue level
+# (`hue_order`) side by side within `width`, in the hue level's color, the way seaborn dodges them. A box takes box_width of
+# its slot; the median is drawn in median_color, inset from the box sides by median_inset; the whiskers have no caps, and
+# the fliers are drawn only when fliersize is given. The statistics come from box_stats in one pass, and the boxes, the
+# whiskers and the medians are one collection each, with their colors set as they are made. Empty groups get no box.
+# Sets the x ticks to the categories. Returns the collections (and the fliers, or None) in a dict, like Axes.boxplot.
+def grouped_boxplot(ax, data, x, y, hue, colors, order=None, hue_order=None, width=0.7, box_width=0.98, whis=1.5,
+                    linewidth=1, median_color='w', median_inset=0, fliersize=0, zorder=2):
+    if order is None:
+        order = np.unique(data[x].dropna())
+    if hue_order is None:
+        hue_order = np.unique(data[hue].dropna())
+    n_hue = len(hue_order)
+    x_codes = np.asarray(pd.Categorical(data[x], categories=order).codes, dtype='int64')
+    hue_codes = np.asarray(pd.Categorical(data[hue], categories=hue_order).codes, dtype='int64')
+    groups = np.where((x_codes >= 0) & (hue_codes >= 0), x_codes * n_hue + hue_codes, -1)
+    stats = box_stats(groups, data[y], len(order) * n_hue, whis)
+
+    # the centers of the boxes, group by group (x category, then hue level), and their colors
+    slot = width / n_hue
+    offsets = np.linspace(0, width - slot, n_hue)
+    offsets -= offsets.mean()
+    centers = (np.arange(len(order))[:, None] + offsets).ravel()
+    group_colors = np.tile(np.asarray(colors[:n_hue], dtype=object), len(order))
+    drawn = stats['count'] > 0
+    c, q1, med, q3 = centers[drawn], stats['q1'][drawn], stats['med'][drawn], stats['q3'][drawn]
+    whislo, whishi, box_colors = stats['whislo'][drawn], stats['whishi'][drawn], list(group_colors[drawn])
+    half = slot * box_width / 2
+
+    boxes = PolyCollection(np.stack([np.column_stack([c - half, q1]), np.column_stack([c + half, q1]),
+                                     np.column_stack([c + half, q3]), np.column_stack([c - half, q3])], axis=1),
+                           facecolors=box_colors, edgecolors=box_colors, linewidths=linewidth, zorder=zorder)
+    whiskers = LineCollection(np.concatenate([np.stack([np.column_stack([c, q1]), np.column_stack([c, whislo])], axis=1),
+                                              np.stack([np.column_stack([c, q3]), np.column_stack([c, whishi])], axis=1)]),
+                              colors=box_colors * 2, linewidths=linewidth, zorder=zorder + 1)
+    medians = LineCollection(np.stack([np.column_stack([c - half + median_inset, med]),
+                                       np.column_stack([c + half - median_inset, med])], axis=1),
+                             colors=median_color, linewidths=linewidth, zorder=zorder + 1)
+    for collection in (boxes, whiskers, medians):
+        ax.add_collection(collection)
+
+    fliers = None
+    if fliersize:
+        flier = stats['flier']
+        fliers = ax.scatter(centers[groups[flier]], np.asarray(data[y], dtype='float64')[flier], s=fliersize ** 2,
+                            marker='d', c=list(group_colors[groups[flier]]), zorder=zorder + 1)
+
+    ax.set_xticks(np.arange(len(order)))
+    ax.set_xticklabels([str(label) for label in order])
+    ax.set_xlim(-0.5, len(order) - 0.5)
+    ax.xaxis.grid(False)
+    ax.autoscale_view(scalex=False)
+    return dict(boxes=boxes, whiskers=whiskers, medians=medians, fliers=fliers)
+
+
+# Many lines with a few highlighted (chart 07): the rows of `values` (series x x) are lines over x. The series in
+# `highlights`, a dict of {row: color}, are drawn in their colors, with a marker at the end of the line (raised by
+# marker_offset) and, when labels are given, the series label to the right of it (label_offset further along x); the rest
+# are the background, drawn in one color under them. The background lines, the highlighted lines and the markers are one
+# collection each however many series there are, so hundreds of lines cost about as much as ten; only the labels are one
+# artist per highlight. Returns the background, the lines, the markers and the labels in a dict.
+def highlighted_lines(ax, x, values, highlights, labels=None, background='silver', linewidth=2.5, markersize=6,
+                      marker_offset=0, label_offset=0.2, zorder=0, **label_kwargs):
+    x = np.asarray(x, dtype='float64')
+    values = np.asarray(values, dtype='float64')
+    rows = np.fromiter(highlights, dtype='int64', count=len(highlights))
+    rest = np.setdiff1d(np.arange(len(values)), rows)
+    colors = list(highlights.values())
+    segments = np.stack(np.broadcast_arrays(x, values), axis=-1) # (series, x, 2): one polyline per series
+
+    # solid lines with the caps and joins of Axes.plot (the style's)
+    line_kwargs = dict(linewidths=linewidth, capstyle=rcParams['lines.solid_capstyle'],
+                       joinstyle=rcParams['lines.solid_joinstyle'])
+    back = LineCollection(segments[rest], colors=background, zorder=zorder, **line_kwargs)
+    lines = LineCollection(segments[rows], colors=colors, zorder=zorder + 1, **line_kwargs)
+    ax.add_collection(back)
+    ax.add_collection(lines)
+    ends = values[rows, -1]
+    markers = ax.scatter(np.full(len(rows), x[-1]), ends + marker_offset, s=markersize ** 2, c=colors, edgecolors=colors,
+                         linewidths=rcParams['lines.markeredgewidth'], zorder=zorder + 2)
+    texts = []
+    if labels is not None:
+        for row, end in zip(rows, ends):
+            texts.append(ax.text(x[-1] + label_offset, end, labels[row], **label_kwargs))
+    ax.autoscale_view()
+    return dict(background=back, lines=lines, markers=markers, labels=texts)
+
+
+# DIVERGING BARS **************************************************************************************************************
+
+
+# The colors of bars with positive and negative meanings (charts 03 and 08): `positive` for the values above the threshold,
+# `negative` for the rest, picked for the whole array at once.
+def diverging_colors(values, positive, negative, threshold=0):
+    return np.where(np.asarray(values) > threshold, positive, negative).tolist()
+
+
+# Many strings in one artist, e.g. a label per bar: one Text is moved from one position to the next and drawn there, so the
+# axes hold a single artist (and a figure layout or a tight bbox looks at a single one) however many labels there are. The
+# text properties (font, color, alignment...) are shared by all the strings. Added to the axes with ax.add_artist, it is
+# placed in data coordinates; set_data gives it other positions and strings (a sweep's next frame, see budgetviz.sweep).
+class TextLayer(Artist):
+
+    zorder = 3 # as a Text
+
+    def __init__(self, x, y, strings, **text_kwargs):
+        super().__init__()
+        self.set_data(x, y, strings)
+        self.text = Text(**text_kwargs)
+
+    def __len__(self):
+        return len(self.strings)
+
+    def set_data(self, x, y, strings):
+        self.x, self.y = np.broadcast_arrays(np.asarray(x, dtype='float64'), np.asarray(y, dtype='float64'))
+        self.strings = list(strings)
+        self.stale = True
+
+    # yields the Text set up at each position in turn
+    def _texts(self):
+        text = self.text
+        text.set_figure(self.figure)
+        text.set_transform(self.get_transform())
+        text.set_clip_on(self.get_clip_on())
+        text.set_clip_box(self.get_clip_box())
+        text.set_clip_path(self.get_clip_path())
+        for x, y, string in zip(self.x, self.y, self.strings):
+            text.set_position((x, y))
+            text.set_text(string)
+            yield text
+
+    @allow_rasterization
+    def draw(self, renderer):
+        if self.get_visible():
+            for text in self._texts():
+                text.draw(renderer)
+        self.stale = False
+
+    def get_window_extent(self, renderer=None):
+        boxes = [text.get_window_extent(renderer) for text in self._texts()]
+        return Bbox.union(boxes) if boxes else Bbox.null()
+
+
+# Labels for the bars at `positions` (their y for horizontal bars), one per value, as a TextLayer: fmt is a %-format for the
+# absolute values (the bar's side already tells the sign), placed at positive_x for the positive values and negative_x for
+# the others; either can be an array, e.g. values + 2 to follow the ends of the bars. offset shifts the labels along y.
+def bar_labels(ax, positions, values, fmt='%s', positive_x=0, negative_x=0, offset=0, **text_kwargs):
+    return ax.add_artist(TextLayer(*_bar_label_data(positions, values, fmt, positive_x, negative_x, offset), **text_kwargs))
+
+
+# The same labels for other values, in the TextLayer that bar_labels returned.
+def set_bar_labels(labels, positions, values, fmt='%s', positive_x=0, negative_x=0, offset=0):
+    labels.set_data(*_bar_label_data(positions, values, fmt, positive_x, negative_x, offset))
+
+
+def _bar_label_data(positions, values, fmt, positive_x, negative_x, offset):
+    values = np.asarray(values)
+    x = np.where(values > 0, positive_x, negative_x)
+    strings = np.char.mod(fmt, np.abs(values))
+    return x, np.asarray(positions) + offset, strings
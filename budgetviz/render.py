@@ -0,0 +1,168 @@
+# Render all the charts at once.
+
+# Each chart script has a prepare_data() and a build_chart(data) step and an OUTPUT file name; run on its own, it renders
+# itself and shows the figure. Here the scripts are registered as chart jobs and rendered side by side in a pool of worker
+# processes with the Agg backend (no windows). The dataset isn't sent to the workers: the driver makes sure the binary cache
+# of the CSV exists before the pool starts, and every worker memory-maps it (see budgetviz.data), so all of them read the
+# same pages. Each job reports its wall time and the peak memory (RSS) of its process. The images are saved in one draw, with
+# the tight bbox of each chart's layout cached between runs (see budgetviz.output).
+#
+# Run from the root of the repo:  python -m budgetviz.render [chart names...] [-j JOBS]
+# e.g. python -m budgetviz.render 02 04 -j 2
+
+import argparse
+import hashlib
+import importlib.util
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError: # not on Windows
+    resource = None
+
+from budgetviz.data import DATA_PATH, dataset_fingerprint, load_code_index
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHARTS = ['01_horizontal_bar_charts_grid_from_nyt',
+          '02_area_charts_grid',
+          '03_dumbbell_or_arrow_chart_from_nyt',
+          '04_bubble_chart_with_colored_groups_nyt',
+          '05_grouped_boxplot_from_ggplot',
+          '06_linechart_totals_and_key_parts_nyt',
+          '07_linechart_many_lines',
+          '08_positive_and_negative_bar_charts_comparison']
+
+DPI = 300
+
+
+# THE JOBS ********************************************************************************************************************
+
+
+# The chart's script as a module (the file names start with a digit, so they can't simply be imported); nothing is drawn on
+# import, the data and the figure are only made by its prepare_data() and build_chart().
+def load_chart(name):
+    spec = importlib.util.spec_from_file_location('chart_' + name[:2], os.path.join(ROOT, name + '.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# The charts matching the names given on the command line: a full name or its beginning, e.g. '02'.
+def select_charts(names):
+    if not names:
+        return list(CHARTS)
+    selected = []
+    for name in names:
+        matches = [chart for chart in CHARTS if chart.startswith(name)]
+        if not matches:
+            raise ValueError('no such chart: ' + name)
+        selected += [chart for chart in matches if chart not in selected]
+    return selected
+
+
+def peak_rss():
+    # in bytes; ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+# The source files a chart's image depends on: its script and the budgetviz modules loaded in the process that rendered it,
+# relative to the root of the repo.
+def chart_sources(name):
+    sources = {os.path.join(ROOT, name + '.py')}
+    for module_name, module in list(sys.modules.items()):
+        if module_name.split('.')[0] == 'budgetviz' and getattr(module, '__file__', None):
+            sources.add(module.__file__)
+    return sorted(os.path.relpath(source, ROOT) for source in sources)
+
+
+# What a chart's tight bbox depends on, for the bbox cache of budgetviz.output: the chart, the data and its sources.
+def layout_key(name, path=DATA_PATH):
+    sha = hashlib.sha1(dataset_fingerprint(path).encode())
+    for source in chart_sources(name):
+        with open(os.path.join(ROOT, source), 'rb') as f:
+            sha.update(f.read())
+    return '%s-%s' % (name, sha.hexdigest())
+
+
+# One job, run in a worker: the chart is built headless (see budgetviz.figures), saved, and its figure released. An error is
+# reported in the result rather than raised, so one broken chart doesn't stop the others. The result also lists the
+# selections the chart made and its source files (see budgetviz.build).
+def render_chart(name, output_dir=None):
+    start = time.perf_counter()
+    result = {'chart': name, 'output': None, 'error': None, 'selections': None, 'sources': None}
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        from budgetviz.figures import render
+        from budgetviz.output import save_figure
+        from budgetviz.pivots import record_selections
+        from budgetviz.stages import rows, stage
+
+        module = load_chart(name)
+        output = os.path.join(output_dir, module.OUTPUT) if output_dir else module.OUTPUT
+        with record_selections() as selections, stage('prepare_data') as s:
+            data = module.prepare_data()
+            s.rows_out = rows(data)
+        result['output'] = render(module.build_chart, data, output, save=save_figure, dpi=DPI, layout=layout_key(name))
+        result['selections'] = selections
+        result['sources'] = chart_sources(name)
+    except Exception as e:
+        result['error'] = '%s: %s' % (type(e).__name__, e)
+    result['wall'] = time.perf_counter() - start
+    result['peak_rss'] = peak_rss()
+    return result
+
+
+# THE DRIVER ******************************************************************************************************************
+
+
+# Renders the charts in `jobs` worker processes and yields the results in the order of the charts. Every worker is used for
+# a single job (where Python allows it, 3.11+), so a job's peak RSS is its own and not the highest of the jobs before it.
+def render_all(charts=None, jobs=None, output_dir=None, path=DATA_PATH):
+    charts = list(CHARTS) if charts is None else charts
+    load_code_index(path) # writes (or checks) the cache the workers will map
+    try:
+        pool = ProcessPoolExecutor(max_workers=jobs, max_tasks_per_child=1)
+    except TypeError:
+        pool = ProcessPoolExecutor(max_workers=jobs)
+    with pool:
+        futures = [pool.submit(render_chart, chart, output_dir) for chart in charts]
+        for future in futures:
+            yield future.result()
+
+
+def format_size(size):
+    if size is None:
+        return '-'
+    return '%.0f MB' % (size / 1024**2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render the charts in parallel.')
+    parser.add_argument('charts', nargs='*', help='the charts to render (a name or its beginning, e.g. 02); all by default')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='the number of worker processes')
+    parser.add_argument('-o', '--output-dir', default=None, help='the folder for the images (the current one by default)')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    failed = 0
+    print('%-50s %9s %10s' % ('chart', 'wall, s', 'peak RSS'))
+    for result in render_all(select_charts(args.charts), args.jobs, args.output_dir):
+        print('%-50s %9.2f %10s' % (result['chart'], result['wall'], format_size(result['peak_rss'])))
+        if result['error']:
+            failed += 1
+            print('    ' + result['error'])
+    print('%-50s %9.2f' % ('total', time.perf_counter() - start))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
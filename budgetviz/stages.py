@@ -0,0 +1,256 @@
+# Per-stage timings of the charts' pipelines.
+
+# A chart goes through the same stages every time. The dataset is read (read_csv, or read_cache when its binary copy is
+# mapped). Rows are selected by codes (query) and pivoted (pivot), both inside budget_pivot, and new columns are derived
+# from them (the rest of prepare_data). Then the figure is drawn (build_chart), its ticks and labels are styled (ticks), it
+# is laid out (tight_layout) and it is saved (savefig). Each stage reports into stage():
+#   with stage('pivot', rows_in=len(selected)) as s:
+#       table = selected.pivot(...)
+#       s.rows_out = len(table)
+# or is a function decorated with @staged('name'). While profiling() is open, each stage records four things: its wall
+# time, its CPU time, the most memory it allocated on top of what there was when it began (tracemalloc), and the rows in
+# and out. Stages nest (a pivot inside budget_pivot inside prepare_data), and a stage's self time is the part its inner
+# stages didn't take. The report goes to a JSON or CSV file, and optionally cProfile's statistics go to a file as well
+# (for pstats or snakeviz). When profiling is off, stage() returns the same do-nothing object every time, and the only cost
+# is a call and a global lookup.
+#
+# Run from the root of the repo:  python -m budgetviz.stages [chart names...] [-o REPORT.json|.csv] [--cprofile FILE]
+# e.g. python -m budgetviz.stages 02 05 -o stages.csv --cold
+
+import argparse
+import csv
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+FIELDS = ['chart', 'stage', 'depth', 'wall', 'self_wall', 'cpu', 'alloc_bytes', 'rows_in', 'rows_out']
+
+_session = None # the Session of the profiling() block that is open, if any
+
+
+# The number of rows of a frame, a series or an array; None for anything else.
+def rows(obj):
+    shape = getattr(obj, 'shape', None)
+    return shape[0] if shape else None
+
+
+# THE HOOKS *******************************************************************************************************************
+
+
+class _Off:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass # rows_out and the like are dropped
+
+
+_OFF = _Off()
+
+
+class _Stage:
+
+    def __init__(self, session, name, rows_in):
+        self.session = session
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+
+    def __enter__(self):
+        session = self.session
+        self.parent = session.stack[-1] if session.stack else None
+        self.path = (self.parent.path if self.parent else ()) + (self.name,)
+        self.order = session.entered
+        session.entered += 1
+        self.inner_wall = 0
+        if session.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self.parent is not None:
+                self.parent.peak = max(self.parent.peak, peak)
+            tracemalloc.reset_peak()
+            self.base = self.peak = current
+        session.stack.append(self)
+        self.cpu = time.process_time()
+        self.wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.wall
+        cpu = time.process_time() - self.cpu
+        session = self.session
+        session.stack.pop()
+        alloc = None
+        if session.memory:
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            alloc = self.peak - self.base
+            if self.parent is not None:
+                self.parent.peak = max(self.parent.peak, self.peak)
+        if self.parent is not None:
+            self.parent.inner_wall += wall
+        session.records.append((self.order, {'chart': self.path[0], 'stage': '/'.join(self.path),
+                                             'depth': len(self.path) - 1, 'wall': wall, 'self_wall': wall - self.inner_wall,
+                                             'cpu': cpu, 'alloc_bytes': alloc, 'rows_in': self.rows_in,
+                                             'rows_out': self.rows_out}))
+        return False
+
+
+# A stage of the pipeline, as a context manager; rows_out can be set on what it returns.
+def stage(name, rows_in=None):
+    if _session is None:
+        return _OFF
+    return _Stage(_session, name, rows_in)
+
+
+# A function as a stage: its result's rows are its rows out.
+def staged(name):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _session is None:
+                return function(*args, **kwargs)
+            with _Stage(_session, name, None) as s:
+                result = function(*args, **kwargs)
+                s.rows_out = rows(result)
+            return result
+        return wrapper
+    return decorator
+
+
+# THE SESSION *****************************************************************************************************************
+
+
+class Session:
+
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.stack = []
+        self.entered = 0 # the stages begun so far
+        self.records = []
+
+    # the records in the order the stages began, so each one comes before the stages inside it
+    def report(self):
+        return [record for order, record in sorted(self.records, key=lambda item: item[0])]
+
+
+# Turns the hooks on while it's open. With memory=False tracemalloc is left off: the allocations aren't measured, and the
+# timings aren't slowed down by tracing. With cprofile set to a file name, cProfile runs as well and its statistics are
+# dumped into that file.
+@contextmanager
+def profiling(memory=True, cprofile=None):
+    global _session
+    if _session is not None:
+        raise RuntimeError('profiling is already on')
+    session = Session(memory)
+    tracing = memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    profiler = None
+    if cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    _session = session
+    try:
+        yield session
+    finally:
+        _session = None
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cprofile)
+        if tracing:
+            tracemalloc.stop()
+
+
+def write_report(records, filename):
+    if filename.lower().endswith('.csv'):
+        with open(filename, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+    else:
+        with open(filename, 'w') as f:
+            json.dump(records, f, indent=1)
+    return filename
+
+
+# The records of the same stage (the ticks of every panel, the budget_pivot calls of a chart) merged into one, in the order
+# the stages first began: the times and rows are summed, the allocations are the largest, and `calls` counts them.
+def summarize(records):
+    merged = dict()
+    for record in records:
+        if record['stage'] not in merged:
+            merged[record['stage']] = dict(record, calls=1)
+            continue
+        total = merged[record['stage']]
+        total['calls'] += 1
+        for field in ('wall', 'self_wall', 'cpu', 'rows_in', 'rows_out'):
+            if record[field] is not None:
+                total[field] = record[field] + (total[field] or 0)
+        if record['alloc_bytes'] is not None:
+            total['alloc_bytes'] = max(record['alloc_bytes'], total['alloc_bytes'] or 0)
+    return list(merged.values())
+
+
+def _format(value, fmt):
+    return '-' if value is None else fmt % value
+
+
+def print_report(records):
+    print('%-56s %5s %8s %8s %8s %10s %9s %9s' % ('stage', 'calls', 'wall, s', 'self, s', 'cpu, s', 'alloc, MB',
+                                                 'rows in', 'rows out'))
+    for record in summarize(records):
+        name = '  ' * record['depth'] + record['stage'].rsplit('/', 1)[-1]
+        alloc = None if record['alloc_bytes'] is None else record['alloc_bytes'] / 1024**2
+        print('%-56s %5d %8.3f %8.3f %8.3f %10s %9s %9s' % (name[:56], record['calls'], record['wall'], record['self_wall'],
+                                                           record['cpu'], _format(alloc, '%.1f'),
+                                                           _format(record['rows_in'], '%d'),
+                                                           _format(record['rows_out'], '%d')))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time every stage of the charts.')
+    parser.add_argument('charts', nargs='*', help='the charts to profile (a name or its beginning, e.g. 02); all by default')
+    parser.add_argument('-o', '--output', default=None, help='the report, a .json or a .csv file')
+    parser.add_argument('-d', '--output-dir', default=None, help='the folder for the images (the current one by default)')
+    parser.add_argument('--cprofile', default=None, help='a file for the cProfile statistics as well')
+    parser.add_argument('--cold', action='store_true',
+                        help='no pivot cache: every chart selects and pivots its rows itself')
+    parser.add_argument('--no-memory', action='store_true', help="don't trace the allocations (faster)")
+    args = parser.parse_args(argv)
+
+    import matplotlib
+    matplotlib.use('Agg')
+    from budgetviz import pivots, stages # run with -m, this file is __main__, not the module the hooks report into
+    from budgetviz.render import render_chart, select_charts
+
+    if args.cold:
+        pivots._default_cache = pivots.PivotCache(max_bytes=0, directory=None)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    failed = 0
+    with stages.profiling(memory=not args.no_memory, cprofile=args.cprofile) as session:
+        for name in select_charts(args.charts):
+            with stages.stage(name):
+                result = render_chart(name, args.output_dir)
+            if result['error']:
+                failed += 1
+                print('%s: %s' % (name, result['error']))
+    records = session.report()
+    print_report(records)
+    if args.output:
+        write_report(records, args.output)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+# Render a chart for every year, or every window of years, as a series of frames.
+
+# Charts 03, 04 and 08 show one year or one window (2011 against 2021, 2021 alone, 2017-2021 against 2012-2016). A chart
+# that can be swept has two more functions next to prepare_data() and build_chart():
+#   sweep_frames(data)  the frames it can show: years, or (first, last) windows of years
+#   build_sweep(data)   its figure, as build_chart makes it, and an update(frame) function that puts another frame's data
+#                       into the artists already there (set_offsets, set_sizes, set_segments, bar widths, texts) and
+#                       returns the artists it changed
+# The figure, its axes, fonts and ticks are made once; each frame only changes the data of the artists and is saved. All the
+# frames are cut to the same box (the tight bbox of the first one), so they line up as the frames of an animation. The box
+# is kept in the bbox cache of budgetviz.output, and the PNG frames are saved in one draw each (save_figure).
+#
+# Run from the root of the repo:  python -m budgetviz.sweep [chart names...] [-o OUTPUT_DIR] [--dpi DPI] [--format png]
+# e.g. python -m budgetviz.sweep 04 -o frames --dpi 100
+
+import argparse
+import os
+import sys
+import time
+
+from budgetviz.figures import close_figure, headless
+from budgetviz.output import FORMATS, _default_cache, save_figure
+from budgetviz.render import CHARTS, DPI, format_size, layout_key, load_chart, peak_rss, select_charts
+
+
+FRAMES_DIR = 'frames'
+
+
+# The charts whose scripts can be swept.
+def sweep_charts(names=None):
+    charts = select_charts(names) if names else CHARTS
+    return [name for name in charts if hasattr(load_chart(name), 'build_sweep')]
+
+
+# A frame as it appears in a file name or a title: 2015, or 2012-2016 for a window.
+def frame_label(frame):
+    return '%d-%d' % tuple(frame) if isinstance(frame, (tuple, list)) else str(frame)
+
+
+def frame_path(output, frame, output_dir=FRAMES_DIR, format='png'):
+    name = os.path.splitext(os.path.basename(output))[0]
+    return os.path.join(output_dir, '%s-%s.%s' % (name, frame_label(frame), format))
+
+
+# The layout of a sweep for the bbox cache: the chart's (its data and code) with the frame the box is found for.
+def sweep_layout(name, frame):
+    return '%s-sweep-%s' % (layout_key(name), frame_label(frame))
+
+
+# The box the frames are cut to, in inches: the tight bbox of the figure as it is now, at dpi, from the bbox cache.
+def frame_bbox(fig, layout, dpi, cache=None):
+    cache = _default_cache if cache is None else cache
+    original_dpi = fig.dpi
+    fig.dpi = dpi
+    try:
+        return cache.bbox(layout, fig)
+    finally:
+        fig.dpi = original_dpi
+
+
+# Renders every frame of a chart (all of sweep_frames by default) into output_dir; yields (frame, file name, seconds) as
+# each frame is written.
+def sweep(name, frames=None, output_dir=FRAMES_DIR, dpi=DPI, format='png'):
+    module = load_chart(name)
+    data = module.prepare_data()
+    frames = module.sweep_frames(data) if frames is None else frames
+    os.makedirs(output_dir, exist_ok=True)
+    with headless():
+        fig, update = module.build_sweep(data)
+        try:
+            bbox = None
+            for frame in frames:
+                start = time.perf_counter()
+                update(frame)
+                if bbox is None:
+                    bbox = frame_bbox(fig, sweep_layout(name, frame), dpi)
+                filename = frame_path(module.OUTPUT, frame, output_dir, format)
+                if format.lower() in FORMATS:
+                    save_figure(fig, filename, dpi, format, bbox=bbox)
+                else:
+                    fig.savefig(filename, dpi=dpi, bbox_inches=bbox)
+                yield frame, filename, time.perf_counter() - start
+        finally:
+            close_figure(fig)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render the frames of the charts that can be swept over years.')
+    parser.add_argument('charts', nargs='*', help='the charts to sweep (a name or its beginning, e.g. 04); all by default')
+    parser.add_argument('-o', '--output-dir', default=FRAMES_DIR, help='the folder for the frames')
+    parser.add_argument('--dpi', type=int, default=DPI)
+    parser.add_argument('--format', default='png', help='the image format of the frames')
+    args = parser.parse_args(argv)
+
+    import matplotlib
+    matplotlib.use('Agg')
+
+    start = time.perf_counter()
+    print('%-50s %-10s %9s' % ('chart', 'frame', 'time, s'))
+    for name in sweep_charts(args.charts):
+        for frame, filename, seconds in sweep(name, output_dir=args.output_dir, dpi=args.dpi, format=args.format):
+            print('%-50s %-10s %9.2f' % (name, frame_label(frame), seconds))
+    print('%-50s %-10s %9.2f' % ('total', '', time.perf_counter() - start))
+    print('peak RSS: %s' % format_size(peak_rss()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,263 @@
+# Synthetic budget datasets, in the schema of russian_budget_data.csv.
+
+# The charts only ever ran on the one dataset (85 regions x 2011-2021), so there was no way to see how they scale before the
+# real data grows. Here a dataset of any size is made up: the same long table (index, region_eng, year, value and the
+# classification codes i1..i3, r1..r5, s1..s2), with every item the charts select (the regional and federal revenues, taxes
+# and spending sections, population, income_per_cap, rub_usd) and plausible values: every region has a size, a growth rate
+# and a role towards the federal center (from a large donor to a heavily dependent region), so the charts' classes and
+# rankings all get filled. More regions, more years and a deeper classification (made-up sub-items under the real items,
+# with codes from 20 up, so they never stand in for a real item in the charts' selections) make it as large as needed.
+#
+# The table is made and written a few regions at a time, so a dataset of several GB never has to fit into memory; the same
+# seed gives the same data whatever the chunk size. Parquet output needs pyarrow.
+#
+# Run from the root of the repo:  python -m budgetviz.synthetic OUTPUT [--regions N] [--years FIRST LAST] [--depth D]
+# e.g. python -m budgetviz.synthetic big/russian_budget_data.csv --regions 850 --years 2001 2021 --depth 1
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from budgetviz.codes import CODE_COLUMNS
+
+
+FEDERAL_REGION = 'russian federation'
+
+# The items of a region: (name, codes in the order of CODE_COLUMNS, a typical value for a region of size 1 in the first year)
+REGIONAL_ITEMS = [
+    ('reg_own_revenue', (1, 1, 1, 1, 0, 0, 0, 0, 0, 0), 1e11),
+    ('transfers_to_reg', (1, 1, 1, 2, 0, 0, 0, 0, 0, 0), 3e10),
+    ('tax_to_fed', (1, 1, 1, 3, 0, 0, 0, 0, 0, 0), 5e10),
+    ('corporate income tax full', (1, 1, 1, 3, 0, 1, 1, 0, 0, 0), 1e10),
+    ('vat on sales', (1, 1, 1, 3, 0, 3, 1, 0, 0, 0), 2e10),
+    ('minerals extraction tax', (1, 1, 1, 3, 0, 7, 1, 0, 0, 0), 3e10),
+    ('oil extraction tax', (1, 1, 1, 3, 0, 7, 1, 1, 0, 0), 2e10),
+    ('gas extraction tax', (1, 1, 1, 3, 0, 7, 1, 2, 0, 0), 8e9),
+    ('gas condensate extraction tax', (1, 1, 1, 3, 0, 7, 1, 3, 0, 0), 2e9),
+    ('additional income from hydrocarbon extraction tax', (1, 1, 1, 3, 0, 7, 5, 0, 0, 0), 5e9),
+    ('reg_spending', (1, 1, 2, 0, 0, 0, 0, 0, 0, 0), 1.2e11),
+    ('national economy', (1, 1, 2, 0, 0, 0, 0, 0, 4, 0), 2e10),
+    ('public road system', (1, 1, 2, 0, 0, 0, 0, 0, 4, 8), 1e10),
+    ('transportation', (1, 1, 2, 0, 0, 0, 0, 0, 4, 9), 5e9),
+    ('housing and utilities sector', (1, 1, 2, 0, 0, 0, 0, 0, 5, 0), 1e10),
+    ('education', (1, 1, 2, 0, 0, 0, 0, 0, 7, 0), 2.5e10),
+    ('healthcare', (1, 1, 2, 0, 0, 0, 0, 0, 9, 0), 1.5e10),
+    ('social policy ', (1, 1, 2, 0, 0, 0, 0, 0, 10, 0), 2e10),
+    ('population', (1, 1, 5, 0, 0, 0, 0, 0, 0, 0), 1.5e6),
+    ('income_per_cap', (1, 1, 7, 0, 0, 0, 0, 0, 0, 0), 3e4),
+    ('rub_usd', (1, 1, 9, 0, 0, 0, 0, 0, 0, 0), 30),
+]
+
+SPENDING_SECTIONS = ['public administration', 'national defense', 'national security', 'national economy',
+                     'housing and utilities sector', 'environmental protection', 'education', 'culture', 'healthcare',
+                     'social policy', 'physical culture and sports', 'mass media']
+
+# The items of the federal budget, with the same layout; the federal rows are the same however many regions there are
+FEDERAL_ITEMS = [
+    ('tax_to_fed', (2, 1, 1, 3, 0, 0, 0, 0, 0, 0), 1.5e13),
+    ('corporate income tax full', (2, 1, 1, 3, 0, 1, 1, 0, 0, 0), 2e12),
+    ('personal income tax', (2, 1, 1, 3, 0, 2, 1, 0, 0, 0), 1e12),
+    ('vat on sales', (2, 1, 1, 3, 0, 3, 1, 0, 0, 0), 4e12),
+    ('excises', (2, 1, 1, 3, 0, 4, 1, 0, 0, 0), 8e11),
+    ('minerals extraction tax', (2, 1, 1, 3, 0, 7, 1, 0, 0, 0), 6e12),
+    ('water tax', (2, 1, 1, 3, 0, 7, 2, 0, 0, 0), 5e11),
+    ('additional income from hydrocarbon extraction tax', (2, 1, 1, 3, 0, 7, 5, 0, 0, 0), 1.5e12),
+    ('state duty', (2, 1, 1, 3, 0, 8, 1, 0, 0, 0), 3e11),
+    ('fed_tax_revenue', (2, 2, 1, 1, 0, 0, 0, 0, 0, 0), 1.6e13),
+    ('fed_nontax_revenue', (2, 2, 1, 2, 0, 0, 0, 0, 0, 0), 8e12),
+    ('international trade revenues', (2, 2, 1, 2, 0, 10, 0, 0, 0, 0), 4e12),
+    ('fed_spending', (2, 2, 2, 0, 0, 0, 0, 0, 0, 0), 2.2e13),
+] + [(name, (2, 2, 2, 0, 0, 0, 0, 0, s1, 0), 3e12 / s1) for s1, name in enumerate(SPENDING_SECTIONS, start=1)]
+
+# The regions the charts name (chart 04 annotates them), with their role: the donors give the center more than their own
+# revenue, the dependent regions get more than theirs; the rest of the regions are made up ('region 021'...)
+DONOR_REGIONS = ['khanty-mansiysk autonomous okrug – ugra', 'yamalo-nenets autonomous okrug', 'moscow', 'tatarstan',
+                 'saint petersburg', 'tyumen oblast', 'samara oblast', 'komi', 'irkutsk oblast', 'tomsk oblast',
+                 'permsky krai', 'udmurtia', 'astrakhan oblast', 'orenburg oblast', 'nenets autonomous okrug']
+DEPENDENT_REGIONS = ['chukotka autonomous okrug', 'crimea', 'kaliningrad oblast', 'jewish autonomous oblast',
+                     'north osetia - alania']
+
+# The indicators (population, income, the exchange rate) aren't budget items: they get no sub-items
+INDICATORS = {5, 7, 9} # i3
+
+SUBITEM_CODE = 20 # the code of the first made-up sub-item on a level
+
+REVENUE_LEVELS = [CODE_COLUMNS.index(c) for c in ('r1', 'r2', 'r3', 'r4', 'r5')]
+SPENDING_LEVELS = [CODE_COLUMNS.index(c) for c in ('s1', 's2')]
+
+
+# THE CLASSIFICATION **********************************************************************************************************
+
+
+# `breadth` made-up sub-items of an item, on the level below its deepest code (a revenue item's next r, a spending
+# section's s2); none for the indicators, the items already on the last level and the totals without a code of their own.
+def _subitems(name, codes, value, breadth):
+    if codes[2] in INDICATORS:
+        return []
+    for levels in (REVENUE_LEVELS, SPENDING_LEVELS):
+        used = [level for level in levels if codes[level]]
+        if used and used[-1] != levels[-1]:
+            level = levels[levels.index(used[-1]) + 1]
+            break
+    else:
+        return []
+    items = []
+    for k in range(breadth):
+        sub = list(codes)
+        sub[level] = SUBITEM_CODE + k
+        items.append(('%s - item %d' % (name, k + 1), tuple(sub), value / breadth))
+    return items
+
+
+# The items with `depth` generations of sub-items, each item followed by its own.
+def classification(items, depth=0, breadth=3):
+    if depth <= 0:
+        return list(items)
+    tree = []
+    for item in items:
+        tree.append(item)
+        tree += classification(_subitems(*item, breadth), depth - 1, breadth)
+    return tree
+
+
+# THE DATA ********************************************************************************************************************
+
+
+# The names of n regions and their roles (their net flow with the center as a share of their own revenue: -1 or less for a
+# large donor, 1 or more for a heavily dependent region), as (low, high) bounds to draw it from.
+def regions(n_regions):
+    named = [(name, (-2.5, -1.4)) for name in DONOR_REGIONS] + [(name, (1.4, 2.5)) for name in DEPENDENT_REGIONS]
+    made_up = [('region %03d' % (k + 1), (-2.5, 2.5)) for k in range(len(named), n_regions)]
+    return (named + made_up)[:n_regions]
+
+
+def _items_frame(items):
+    names = [item[0] for item in items]
+    codes = np.array([item[1] for item in items], dtype='int64')
+    base = np.array([item[2] for item in items], dtype='float64')
+    return names, codes, base
+
+
+# The regional rows of some regions (their numbers in the roster of regions), region by region, year by year, item by
+# item; each region draws from its own random stream, so it gets the same values in any chunk.
+def _regional_chunk(numbers, roster, items, years, seed):
+    item_names, codes, base = _items_frame(items)
+    index = {name: i for i, name in enumerate(item_names)}
+    years = np.asarray(years)
+    t = years - years[0]
+    n_items, n_years = len(items), len(years)
+    values = np.empty((len(numbers), n_years, n_items))
+    for r, number in enumerate(numbers):
+        rng = np.random.default_rng([seed, 1, number])
+        size = rng.lognormal(0, 0.6)
+        growth = (1 + rng.normal(0.06, 0.02)) ** t # (year,)
+        values[r] = base * size * growth[:, None] * rng.uniform(0.7, 1.3, (n_years, n_items))
+        own = 1e11 * size * growth
+        role = rng.uniform(*roster[number][1]) + rng.normal(0, 0.05, n_years)
+        values[r, :, index['reg_own_revenue']] = own
+        values[r, :, index['tax_to_fed']] = own * (np.maximum(-role, 0) + rng.uniform(0.05, 0.3, n_years))
+        values[r, :, index['transfers_to_reg']] = own * (np.maximum(role, 0) + rng.uniform(0.05, 0.3, n_years))
+        values[r, :, index['population']] = 1.5e6 * size * (1 + rng.normal(0, 0.005)) ** t
+        values[r, :, index['income_per_cap']] = 3e4 * growth * rng.lognormal(0, 0.3)
+    values[:, :, index['rub_usd']] = _rub_usd(years)
+    return _long_frame(values, [roster[number][0] for number in numbers], years, item_names, codes)
+
+
+def _federal_rows(items, years, seed):
+    item_names, codes, base = _items_frame(items)
+    years = np.asarray(years)
+    rng = np.random.default_rng([seed, 0])
+    values = base * 1.06 ** (years - years[0])[:, None] * rng.uniform(0.9, 1.1, (len(years), len(items)))
+    return _long_frame(values[None], [FEDERAL_REGION], years, item_names, codes)
+
+
+def _rub_usd(years):
+    return 30 * 1.08 ** (years - 2011)
+
+
+# (region, year, item) values -> the long table, in the order of the array
+def _long_frame(values, region_names, years, item_names, codes):
+    n_regions, n_years, n_items = values.shape
+    rows = n_regions * n_years * n_items
+    frame = pd.DataFrame({'index': np.tile(np.asarray(item_names, dtype=object), n_regions * n_years),
+                          'region_eng': np.repeat(np.asarray(region_names, dtype=object), n_years * n_items),
+                          'year': np.tile(np.repeat(years, n_items), n_regions),
+                          'value': values.reshape(rows)})
+    for col, column in zip(CODE_COLUMNS, np.tile(codes, (n_regions * n_years, 1)).T):
+        frame[col] = column
+    return frame
+
+
+# The dataset in pieces of chunk_regions regions each (the federal rows come with the last piece), with a running row
+# number as the index, as in the CSV.
+def generate(n_regions=85, years=range(2011, 2022), depth=0, breadth=3, seed=0, chunk_regions=100):
+    roster = regions(n_regions)
+    regional = classification(REGIONAL_ITEMS, depth, breadth)
+    start = 0
+    for first in range(0, n_regions, chunk_regions):
+        frame = _regional_chunk(range(first, min(first + chunk_regions, n_regions)), roster, regional, years, seed)
+        if first + chunk_regions >= n_regions:
+            frame = pd.concat([frame, _federal_rows(classification(FEDERAL_ITEMS, depth, breadth), years, seed)],
+                              ignore_index=True)
+        frame.index = pd.RangeIndex(start, start + len(frame))
+        start += len(frame)
+        yield frame
+
+
+# THE FILES *******************************************************************************************************************
+
+
+# Writes the dataset to a CSV (as the scripts read it) or, for a .parquet file name, to Parquet, a piece at a time; the
+# keywords are those of generate(). Returns the number of rows.
+def write_dataset(path, **kwargs):
+    if os.path.splitext(path)[1] == '.parquet':
+        return _write_parquet(path, generate(**kwargs))
+    rows = 0
+    with open(path, 'w', newline='') as f:
+        for frame in generate(**kwargs):
+            frame.to_csv(f, header=rows == 0)
+            rows += len(frame)
+    return rows
+
+
+def _write_parquet(path, frames):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError('writing Parquet needs pyarrow (pip install pyarrow)') from None
+    rows = 0
+    writer = None
+    try:
+        for frame in frames:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            rows += len(frame)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a synthetic budget dataset.')
+    parser.add_argument('output', help='the file to write: .csv, or .parquet (needs pyarrow)')
+    parser.add_argument('--regions', type=int, default=85, help='the number of regions')
+    parser.add_argument('--years', type=int, nargs=2, default=(2011, 2021), metavar=('FIRST', 'LAST'))
+    parser.add_argument('--depth', type=int, default=0, help='the generations of made-up sub-items under the items')
+    parser.add_argument('--breadth', type=int, default=3, help='the sub-items of an item')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-regions', type=int, default=100, help='the regions made and written at a time')
+    args = parser.parse_args(argv)
+
+    rows = write_dataset(args.output, n_regions=args.regions, years=range(args.years[0], args.years[1] + 1),
+                         depth=args.depth, breadth=args.breadth, seed=args.seed, chunk_regions=args.chunk_regions)
+    print('%d rows -> %s' % (rows, args.output))
+
+
+if __name__ == '__main__':
+    main()
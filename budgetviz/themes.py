@@ -0,0 +1,128 @@
+# Named looks for the ticks, tick labels, spines and grid, applied to many axes at once.
+
+# The charts used to style their tick labels one at a time: for label in ax.get_xticklabels(): label.set(fontsize=12, ...).
+# Asking an axis for its tick labels makes it run its locator and formatter and create every tick right away. A grid of 20
+# panels paid for that 20 times, and the style only reached the ticks that existed at that moment (and the ones copied
+# from them later). A Theme holds the same settings as tick_params keywords for the x and the y axis (label sizes and
+# colors, the ticks' color, direction, length and pad). It also holds the spines to hide or restyle, and where the grid
+# and ticks go among the artists (axisbelow). style_axes() applies a theme to any number of axes with one tick_params call
+# per axis. The axis keeps the settings for the ticks it makes later, and no tick or Text is touched one by one. THEMES
+# holds the charts' looks by name.
+# theme.rc() gives the same settings as rcParams (without the per-spine styles), plus the theme's font weight. It works for
+# axes whose ticks are made while those settings are in effect, e.g. a chart built and saved in one theme_context().
+# tick_params takes no font weight, so a bold theme's labels get their weight from font.weight: the axes are made in
+# weight_context() (or theme_context()), and their ticks take the weight the axes were made in. rcParams hold one weight
+# for all text, so both axes' labels (and any text made in the context without a weight of its own) are set in it.
+
+from contextlib import contextmanager
+
+import numpy as np
+
+
+# the tick_params keywords that have an rc setting, and its name after 'xtick.' or 'ytick.'
+RC_NAMES = {'labelsize': 'labelsize', 'labelcolor': 'labelcolor', 'color': 'color', 'direction': 'direction',
+            'length': 'major.size', 'width': 'major.width', 'pad': 'major.pad'}
+
+COLOR_PARAMS = ('color', 'labelcolor')
+
+
+class Theme:
+
+    # x and y are the tick_params keywords of each axis (for the major ticks); spines maps a side to False (hidden) or to
+    # the Spine properties to set; axisbelow is Axes.set_axisbelow's (True, 'line' or False); weight is the font weight of
+    # the axes made in weight_context() or theme_context().
+    def __init__(self, x=None, y=None, spines=None, axisbelow=None, weight=None):
+        self.x = dict(x or ())
+        self.y = dict(y or ())
+        self.spines = dict(spines or ())
+        self.axisbelow = axisbelow
+        self.weight = weight
+
+    # A copy with some settings added or changed.
+    def updated(self, x=None, y=None, spines=None, axisbelow=None, weight=None):
+        return Theme(dict(self.x, **(x or dict())), dict(self.y, **(y or dict())), dict(self.spines, **(spines or dict())),
+                     self.axisbelow if axisbelow is None else axisbelow, self.weight if weight is None else weight)
+
+    def rc(self):
+        rc = dict()
+        for prefix, params in (('xtick', self.x), ('ytick', self.y)):
+            for name, value in params.items():
+                if name in RC_NAMES:
+                    rc['%s.%s' % (prefix, RC_NAMES[name])] = value
+        for side, spine in self.spines.items():
+            if spine is False:
+                rc['axes.spines.' + side] = False
+        if self.axisbelow is not None:
+            rc['axes.axisbelow'] = self.axisbelow
+        if self.weight is not None:
+            rc['font.weight'] = self.weight
+        return rc
+
+
+NYT = Theme(x=dict(labelsize=12, labelcolor='#4f5b66'), y=dict(labelsize=12, labelcolor='k'))
+
+THEMES = {
+    'nyt': NYT, # charts 01, 04, 08
+    # charts 06 and 07: ticks across the axis line ('inout' draws them as '|'; a pad of 6 keeps the labels where 'out'
+    # puts them), on a bottom spine moved 10 points down
+    'nyt_lines': NYT.updated(x=dict(color='#4f5b66', direction='inout', length=5, pad=6), y=dict(color='#4f5b66'),
+                             spines={'bottom': dict(position=('outward', 10))}),
+    'dumbbell': Theme(x=dict(labelsize=12, labelcolor='dimgray', length=0), y=dict(labelsize=12, labelcolor='k', length=0)),
+    'small_multiples': Theme(x=dict(labelsize=12, labelcolor='#4f5b66'), y=dict(labelsize=13),
+                             spines={'top': False, 'right': False, 'left': dict(zorder=3, linewidth=1.2),
+                                     'bottom': dict(zorder=3, linewidth=1.2)}, weight='bold'), # chart 02
+    'ggplot': Theme(x=dict(labelsize=12, labelcolor='#4f5b66', color='silver'), y=dict(labelsize=12, color='silver'),
+                    spines={'top': False, 'right': False, 'left': dict(color='silver'), 'bottom': dict(color='silver')},
+                    axisbelow=True, weight='bold'), # chart 05
+}
+
+
+def get_theme(theme):
+    if isinstance(theme, Theme):
+        return theme
+    if theme not in THEMES:
+        raise ValueError('no such theme: %s (there are %s)' % (theme, ', '.join(sorted(THEMES))))
+    return THEMES[theme]
+
+
+# THE STYLING *****************************************************************************************************************
+
+
+# Applies the theme (a Theme or a name in THEMES) to the axes: one Axes, or a list or an array of them. The theme's weight
+# isn't applied here: the axes get it by being made in weight_context(). The colors are turned into RGBA once, rather than
+# parsed again by every tick the axes make.
+def style_axes(axes, theme):
+    from matplotlib.colors import to_rgba
+    theme = get_theme(theme)
+    x, y = ({name: to_rgba(value) if name in COLOR_PARAMS else value for name, value in params.items()}
+            for params in (theme.x, theme.y))
+    hidden = [side for side, spine in theme.spines.items() if spine is False]
+    for ax in np.ravel(axes):
+        for axis, params in ((ax.xaxis, x), (ax.yaxis, y)):
+            if params:
+                axis.set_tick_params(**params)
+        if hidden:
+            ax.spines[hidden].set_visible(False)
+        for side, spine in theme.spines.items():
+            if spine is not False:
+                ax.spines[side].set(**spine)
+        if theme.axisbelow is not None:
+            ax.set_axisbelow(theme.axisbelow)
+
+
+# The theme's rc settings while it's open: the axes made in it, and their ticks, follow the theme without style_axes.
+@contextmanager
+def theme_context(theme):
+    import matplotlib
+    with matplotlib.rc_context(get_theme(theme).rc()):
+        yield
+
+
+# The theme's font weight alone while it's open (the rest of the theme is left to style_axes): the axes made in it have
+# their tick labels in the weight.
+@contextmanager
+def weight_context(theme):
+    import matplotlib
+    weight = get_theme(theme).weight
+    with matplotlib.rc_context({'font.weight': weight} if weight is not None else None):
+        yield
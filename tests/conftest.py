@@ -0,0 +1,8 @@
+# The tests import budgetviz from the root of the repo, as the chart scripts and the benchmarks do.
+#
+# Run from the root of the repo:  python -m pytest -q
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,84 @@
+# The incremental build: after one row of the CSV changes, only the charts whose selections take that row are stale.
+
+import os
+
+import pandas as pd
+import pytest
+
+from budgetviz.build import SelectionDigests, chart_record, stale_reasons
+from budgetviz.pivots import PivotCache, budget_pivot, record_selections
+from budgetviz.synthetic import write_dataset
+
+# chart -> the selections it makes, as budget_pivot calls
+CHARTS = {
+    'population': [dict(i3=5)],
+    'rub_usd': [dict(i3=9)],
+    'both': [dict(i3=5), dict(i3=9)],
+    'flows_2021': [dict(i1=1, i3=1, years=[2021])],
+}
+
+
+@pytest.fixture
+def csv(tmp_path):
+    path = str(tmp_path / 'russian_budget_data.csv')
+    write_dataset(path, n_regions=5, years=range(2019, 2022))
+    return path
+
+
+# The manifest records of the charts, as if they had just been rendered from the CSV.
+def build(csv, tmp_path):
+    digests = SelectionDigests(csv)
+    records = dict()
+    for chart, calls in CHARTS.items():
+        with record_selections() as selections:
+            for kwargs in calls:
+                budget_pivot(path=csv, cache=PivotCache(directory=None), **kwargs)
+        output = str(tmp_path / (chart + '.png'))
+        open(output, 'wb').close()
+        result = {'output': output, 'sources': [], 'selections': selections}
+        records[chart] = chart_record(result, digests)
+    return records
+
+
+# Changes the value of the first row that matches the query, in the text of the CSV: written back through pandas, the other
+# rows' values wouldn't all be read back to the same float.
+def change_row(csv, query):
+    row = str(pd.read_csv(csv, index_col=0).query(query).index[0])
+    with open(csv, newline='') as f:
+        lines = list(f)
+    header = lines[0].rstrip('\r\n').split(',')
+    for n, line in enumerate(lines):
+        fields = line.split(',')
+        if fields[0] == row:
+            fields[header.index('value')] = repr(float(fields[header.index('value')]) * 1.5)
+            lines[n] = ','.join(fields)
+            break
+    with open(csv, 'w', newline='') as f:
+        f.writelines(lines)
+    stat = os.stat(csv)
+    os.utime(csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9)) # a new mtime even on a coarse clock
+
+
+def stale(records, csv):
+    digests = SelectionDigests(csv)
+    return {chart for chart, record in records.items() if stale_reasons(record, digests)}
+
+
+def test_up_to_date(csv, tmp_path):
+    assert stale(build(csv, tmp_path), csv) == set()
+
+
+def test_one_row_changed(csv, tmp_path):
+    records = build(csv, tmp_path)
+    change_row(csv, "index == 'population' & year == 2020")
+    assert stale(records, csv) == {'population', 'both'}
+    reasons = stale_reasons(records['population'], SelectionDigests(csv))
+    assert len(reasons) == 1 and reasons[0].startswith('data changed: i3 == 5')
+
+
+def test_row_outside_the_years(csv, tmp_path):
+    records = build(csv, tmp_path)
+    change_row(csv, "index == 'reg_own_revenue' & year == 2019") # flows_2021 takes the same item, but of 2021 only
+    assert stale(records, csv) == set()
+    change_row(csv, "index == 'reg_own_revenue' & year == 2021")
+    assert stale(records, csv) == {'flows_2021'}
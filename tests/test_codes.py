@@ -0,0 +1,50 @@
+# CodeIndex.rows against df.query: the same selections, on random code columns, must give exactly the same rows.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from budgetviz.codes import CODE_COLUMNS, CodeIndex, gt, ne
+
+
+@pytest.fixture(scope='module')
+def codes():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({c: rng.integers(0, 4, 5000) for c in CODE_COLUMNS})
+
+
+# (the clauses for CodeIndex.rows, the same selection for df.query)
+SELECTIONS = [
+    ([dict(i1=1)], 'i1 == 1'),
+    ([dict(i1=1, i3=2)], 'i1 == 1 & i3 == 2'),
+    ([dict(i1=1, r1=3, r3=(1, 3))], 'i1 == 1 & r1 == 3 & r3 in (1, 3)'),
+    ([dict(i1=1, r3=[0, 2], s2=range(2, 4))], 'i1 == 1 & r3 in (0, 2) & s2 in (2, 3)'),
+    ([dict(s2=1)], 's2 == 1'), # only the last level constrained
+    ([dict(i1=1, r1=ne(0), r3=0)], 'i1 == 1 & r1 != 0 & r3 == 0'),
+    ([dict(i2=gt(1), s1=2)], 'i2 > 1 & s1 == 2'),
+    ([dict(i1=1, i3=2), dict(i1=1, i3=3)], '(i1 == 1 & i3 == 2) | (i1 == 1 & i3 == 3)'),
+    ([dict(i1=1, i3=(2, 3)), dict(i3=3, r1=0)], '(i1 == 1 & i3 in (2, 3)) | (i3 == 3 & r1 == 0)'), # overlapping clauses
+    ([dict(i1=7)], 'i1 == 7'), # no match
+    ([dict(i1=1, r1=ne(0)), dict(i1=9)], '(i1 == 1 & r1 != 0) | i1 == 9'),
+]
+
+
+@pytest.mark.parametrize('clauses, query', SELECTIONS)
+def test_rows_match_query(codes, clauses, query):
+    expected = np.flatnonzero(codes.eval(query).values)
+    rows = CodeIndex(codes).rows(*clauses)
+    assert np.array_equal(rows, expected)
+    assert codes.iloc[rows].equals(codes.query(query))
+
+
+def test_keywords_are_one_clause(codes):
+    index = CodeIndex(codes)
+    assert np.array_equal(index.rows(i1=1, r1=ne(0), r3=0), index.rows(dict(i1=1, r1=ne(0), r3=0)))
+    assert index.count(i1=1, i3=2) == len(codes.query('i1 == 1 & i3 == 2'))
+
+
+def test_rows_in_original_order(codes):
+    shuffled = codes.sample(frac=1, random_state=1).reset_index(drop=True)
+    rows = CodeIndex(shuffled).rows(dict(i1=1, i3=2), dict(i1=2))
+    assert np.all(np.diff(rows) > 0)
+    assert np.array_equal(rows, np.flatnonzero(shuffled.eval('(i1 == 1 & i3 == 2) | i1 == 2').values))
@@ -0,0 +1,72 @@
+# The pivot cache: a selection pivoted through the cache is the frame df.query + pivot gives, and the frames kept in memory
+# never take more than the byte budget, the least recently used going first.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from budgetviz.codes import CODE_COLUMNS
+from budgetviz.pivots import PivotCache, budget_pivot
+
+ITEMS = 6 # item k has the codes i1=1, i3=k, the others 0
+YEARS = range(2011, 2022)
+REGIONS = ['region %02d' % k for k in range(20)]
+
+
+@pytest.fixture(scope='module')
+def csv(tmp_path_factory):
+    rows = pd.MultiIndex.from_product([range(ITEMS), YEARS, REGIONS], names=['i3', 'year', 'region_eng'])
+    df = rows.to_frame(index=False)
+    df.insert(0, 'index', 'item ' + df['i3'].astype(str))
+    df['value'] = np.random.default_rng(0).uniform(0, 1e9, len(df))
+    for c in CODE_COLUMNS:
+        if c != 'i3':
+            df[c] = 1 if c == 'i1' else 0
+    path = tmp_path_factory.mktemp('data') / 'budget.csv'
+    df.to_csv(path)
+    return str(path)
+
+
+def test_pivot_matches_query(csv):
+    df = pd.read_csv(csv, index_col=0)
+    expected = df.query('i1 == 1 & i3 in (1, 2)').pivot(index=['year', 'region_eng'], columns='index', values='value')
+    table = budget_pivot(i1=1, i3=(1, 2), path=csv, cache=PivotCache(directory=None))
+    pd.testing.assert_frame_equal(table, expected, check_names=False)
+
+
+def test_eviction_keeps_within_budget(csv):
+    size = PivotCache(directory=None)
+    budget_pivot(i1=1, i3=0, path=csv, cache=size)
+    one = size.nbytes # every item pivots into a frame of the same size
+
+    cache = PivotCache(max_bytes=int(2.5 * one), directory=None)
+    for item in range(ITEMS):
+        budget_pivot(i1=1, i3=item, path=csv, cache=cache)
+        assert cache.nbytes <= cache.max_bytes
+        assert cache.nbytes == sum(cache.sizes.values())
+        assert set(cache.sizes) == set(cache.frames)
+    assert len(cache.frames) == 2
+    assert cache.misses == ITEMS
+
+    budget_pivot(i1=1, i3=ITEMS - 2, path=csv, cache=cache) # still in memory, and now the most recently used
+    assert cache.hits == 1
+    budget_pivot(i1=1, i3=0, path=csv, cache=cache) # evicted long ago: read again, evicting item ITEMS - 1
+    assert cache.misses == ITEMS + 1
+    budget_pivot(i1=1, i3=ITEMS - 2, path=csv, cache=cache)
+    assert cache.hits == 2
+    assert cache.nbytes <= cache.max_bytes
+
+
+def test_frame_over_budget_is_not_kept(csv):
+    cache = PivotCache(max_bytes=1, directory=None)
+    table = budget_pivot(i1=1, i3=1, path=csv, cache=cache)
+    assert len(table) == len(YEARS) * len(REGIONS)
+    assert cache.nbytes == 0 and not cache.frames
+
+
+def test_evicted_frames_come_back_from_disk(csv, tmp_path):
+    cache = PivotCache(max_bytes=1, directory=str(tmp_path / 'pivots'))
+    first = budget_pivot(i1=1, i3=3, path=csv, cache=cache)
+    again = budget_pivot(i1=1, i3=3, path=csv, cache=cache)
+    assert (cache.misses, cache.disk_hits, cache.nbytes) == (1, 1, 0)
+    pd.testing.assert_frame_equal(first, again)
@@ -0,0 +1,59 @@
+# box_stats against matplotlib's own box statistics (matplotlib.cbook.boxplot_stats), group by group: with ties, with
+# values left out (NaN, or the group -1), and with empty groups.
+
+import numpy as np
+import pytest
+from matplotlib import cbook
+
+from budgetviz.plots import box_stats
+
+
+def compare(groups, values, n_groups, whis=1.5):
+    stats = box_stats(groups, values, n_groups, whis)
+    groups, values = np.asarray(groups), np.asarray(values, dtype='float64')
+    for group in range(n_groups):
+        taken = (groups == group) & ~np.isnan(values)
+        assert stats['count'][group] == taken.sum()
+        if not taken.any():
+            for key in ('q1', 'med', 'q3', 'whislo', 'whishi'):
+                assert np.isnan(stats[key][group])
+            assert not stats['flier'][groups == group].any()
+            continue
+        expected, = cbook.boxplot_stats(values[taken], whis=whis)
+        for key in ('q1', 'med', 'q3', 'whislo', 'whishi'):
+            assert stats[key][group] == pytest.approx(expected[key], rel=1e-12, abs=1e-12), (group, key)
+        assert np.array_equal(np.sort(values[taken & stats['flier']]), np.sort(expected['fliers'])), group
+    assert not stats['flier'][np.isnan(values) | (groups < 0)].any()
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_random_groups(seed):
+    rng = np.random.default_rng(seed)
+    n = 2000
+    groups = rng.integers(-1, 12, n) # -1: left out
+    values = rng.standard_t(2, n) * 100 # heavy tails, so there are fliers
+    values[rng.random(n) < 0.05] = np.nan
+    groups[groups == 7] = 8 # group 7 is empty
+    compare(groups, values, 12)
+
+
+def test_ties():
+    rng = np.random.default_rng(0)
+    groups = rng.integers(0, 5, 500)
+    values = rng.integers(0, 6, 500).astype(float) # few distinct values: ties everywhere, quartiles on equal values
+    values[:5] = 100 # and a flier
+    compare(groups, values, 5)
+    compare([0, 0, 0, 1], [3, 3, 3, 7], 2) # a constant group, a single value
+
+
+def test_whis():
+    rng = np.random.default_rng(1)
+    groups, values = rng.integers(0, 4, 800), rng.standard_cauchy(800)
+    for whis in (0, 0.5, 3):
+        compare(groups, values, 4, whis)
+
+
+def test_empty():
+    stats = box_stats([], [], 3)
+    assert np.array_equal(stats['count'], [0, 0, 0]) and np.isnan(stats['med']).all()
+    compare([0, 0, 2], [np.nan, np.nan, 1.0], 3) # a group of NaN only is empty